@@ -1,6 +1,11 @@
 from pydub import AudioSegment
 from google.cloud import speech_v1p1beta1 as speech
 
+from audio_io import load_pcm, probe_audio
+from srtlib import format_cue
+from timestamps import seconds_to_ms, timedelta_to_ms
+from transcribe import transcribe_long_audio
+
 def convert_to_mono(audio_file_path, output_file_path):
     audio = AudioSegment.from_file(audio_file_path)
     mono_audio = audio.set_channels(1)
@@ -8,18 +13,14 @@ def convert_to_mono(audio_file_path, output_file_path):
     return output_file_path
 
 def get_sample_rate(audio_file_path):
-    audio = AudioSegment.from_file(audio_file_path)
-    return audio.frame_rate
+    # 只读取文件头，不解码音频
+    return probe_audio(audio_file_path)['sample_rate']
 
 def transcribe_audio(audio_file_path):
     client = speech.SpeechClient()
 
-    # 自动检测音频文件的采样率
-    sample_rate = get_sample_rate(audio_file_path)
-
-    # 读取音频文件
-    with open(audio_file_path, "rb") as audio_file:
-        content = audio_file.read()
+    # 一次解码同时转为单声道 PCM，不再写临时 WAV
+    content, sample_rate = load_pcm(audio_file_path)
 
     # 将音频数据编码为base64
     audio = speech.RecognitionAudio(content=content)
@@ -36,60 +37,61 @@ def transcribe_audio(audio_file_path):
 
     return response
 
-def create_srt_subtitles(response, output_file="subtitles.srt", max_chars=40, max_duration=4.0):
-    srt_counter = 1
-    srt_content = ""
-
-    for result in response.results:
-        alternative = result.alternatives[0]
-        words_info = alternative.words
-
-        block_start_time = words_info[0].start_time.total_seconds()
-        block_end_time = block_start_time
-        block_text = ""
-        block_duration = 0.0
-
-        for i, word_info in enumerate(words_info):
-            start_time = word_info.start_time.total_seconds()
-            end_time = word_info.end_time.total_seconds()
+def iter_word_blocks(words, max_chars=40, max_duration=4.0):
+    """Groups (word, start_ms, end_ms) tuples into subtitle blocks and yields (start_ms, end_ms, text)."""
+    if not words:
+        return
+    max_duration_ms = seconds_to_ms(max_duration)
 
-            block_duration += end_time - start_time
+    block_start_ms = words[0][1]
+    block_end_ms = block_start_ms
+    block_text = ""
+    block_duration_ms = 0
 
-            # 根据标点符号或最大字符数/时间创建新字幕块
-            block_text += word_info.word
-            if (len(block_text) >= max_chars or word_info.word in "，。！？" or block_duration > max_duration):
-                block_end_time = end_time
-                block_start_time_str = f"{int(block_start_time // 3600):02}:{int((block_start_time // 60) % 60):02}:{int(block_start_time % 60):02},{int((block_start_time % 1) * 1000):03}"
-                block_end_time_str = f"{int(block_end_time // 3600):02}:{int((block_end_time // 60) % 60):02}:{int(block_end_time % 60):02},{int((block_end_time % 1) * 1000):03}"
+    for word, start_ms, end_ms in words:
+        block_duration_ms += end_ms - start_ms
 
-                srt_content += f"{srt_counter}\n{block_start_time_str} --> {block_end_time_str}\n{block_text.strip()}\n\n"
-                srt_counter += 1
+        # 根据标点符号或最大字符数/时间创建新字幕块
+        block_text += word
+        if (len(block_text) >= max_chars or word in "，。！？" or block_duration_ms > max_duration_ms):
+            block_end_ms = end_ms
+            yield block_start_ms, block_end_ms, block_text.strip()
 
-                block_start_time = end_time
-                block_text = ""
-                block_duration = 0.0
+            block_start_ms = end_ms
+            block_text = ""
+            block_duration_ms = 0
 
     # 写入最后一个块（防止遗漏）
     if block_text:
-        block_start_time_str = f"{int(block_start_time // 3600):02}:{int((block_start_time // 60) % 60):02}:{int(block_start_time % 60):02},{int((block_start_time % 1) * 1000):03}"
-        block_end_time_str = f"{int(block_end_time // 3600):02}:{int((block_end_time // 60) % 60):02}:{int(block_end_time % 60):02},{int((block_end_time % 1) * 1000):03}"
-
-        srt_content += f"{srt_counter}\n{block_start_time_str} --> {block_end_time_str}\n{block_text.strip()}\n\n"
+        yield block_start_ms, block_end_ms, block_text.strip()
 
+def write_word_blocks(blocks, output_file):
     with open(output_file, "w") as f:
-        f.write(srt_content)
+        f.write("".join(format_cue(i, start_ms, end_ms, text) for i, (start_ms, end_ms, text) in enumerate(blocks, 1)))
 
     print(f"字幕文件已生成: {output_file}")
 
+def create_srt_subtitles(response, output_file="subtitles.srt", max_chars=40, max_duration=4.0):
+    blocks = []
+    for result in response.results:
+        words = [(word_info.word, timedelta_to_ms(word_info.start_time), timedelta_to_ms(word_info.end_time))
+                 for word_info in result.alternatives[0].words]
+        blocks.extend(iter_word_blocks(words, max_chars, max_duration))
+    write_word_blocks(blocks, output_file)
+
+def create_srt_subtitles_from_words(words, output_file="subtitles.srt", max_chars=40, max_duration=4.0):
+    write_word_blocks(iter_word_blocks(words, max_chars, max_duration), output_file)
 
-# 使用示例
-audio_file_path = "segment_0_30.wav"
-mono_audio_file_path = "extracted_audio_mono.wav"
+def transcribe_long_audio_file(audio_file_path, recognizer=None, **kwargs):
+    """Transcribes audio of any length and format with the chunked, concurrent driver, decoding it once."""
+    pcm, sample_rate = load_pcm(audio_file_path)
+    return transcribe_long_audio(pcm, sample_rate, recognizer=recognizer, **kwargs)
 
-# 转换为单声道
-convert_to_mono(audio_file_path, mono_audio_file_path)
 
-# 进行语音识别
-response = transcribe_audio(mono_audio_file_path)
-create_srt_subtitles(response)
+if __name__ == "__main__":
+    # 使用示例
+    audio_file_path = "extracted_audio.wav"
 
+    # 解码时直接转为单声道，分段并发进行语音识别，不再需要手动切成 30 秒的片段
+    words = transcribe_long_audio_file(audio_file_path)
+    create_srt_subtitles_from_words(words)
@@ -1,22 +1,8 @@
-import json
 import re
 
-def parse_offset(offset_str):
-    """Converts offset string (e.g., '0.200s') to seconds and nanoseconds."""
-    if offset_str is None:
-        return 0, 0  # Default value for missing offsets
-    seconds = float(offset_str.replace('s', ''))
-    whole_seconds = int(seconds)
-    nanos = int((seconds - whole_seconds) * 1e9)
-    return whole_seconds, nanos
-
-def format_timestamp(seconds, nanos):
-    """Formats time given in seconds and nanoseconds to SRT timestamp format."""
-    total_seconds = seconds + nanos / 1e9
-    hours, remainder = divmod(total_seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    milliseconds = int((seconds % 1) * 1000)
-    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02},{milliseconds:03}"
+from srtlib import Cue, write_srt
+from timestamps import ns_to_ms, parse_offsets_ns
+from transcript_stream import iter_results
 
 def clean_text(text):
     """Removes unwanted characters from the text."""
@@ -25,69 +11,87 @@ def clean_text(text):
 def split_transcript_by_punctuation(transcript):
     """Splits transcript by punctuation (Chinese and comma) while keeping punctuation attached to the sentence."""
     segments = re.split(r'([。！？，,])', transcript)
+    tail = segments[-1] if len(segments) % 2 else ""
     segments = ["".join(pair) for pair in zip(segments[0::2], segments[1::2])]
+    if tail.strip():
+        segments.append(tail)  # 末尾没有标点的部分也保留
     return segments
 
-def convert_to_srt(json_data, output_srt_file):
-    """Converts JSON data to SRT format."""
-    srt_content = []
+def align_words_to_segments(text_segments, words):
+    """Assigns word tokens to transcript segments in one linear pass.
+
+    One cursor walks the transcript's alphanumeric characters (punctuation, spaces and
+    '▁' are skipped) and records the segment each character belongs to; the other walks
+    the word tokens, advancing the first by the number of alphanumeric characters in
+    each token. A word belongs to the segment of its first character, punctuation-only
+    tokens stay with the segment before them, and extra words past the end of the
+    transcript go to the last segment. Returns one (first_word, last_word) index pair
+    per segment, or None for segments no word landed in.
+    """
+    segment_of_char = []
+    for segment_index, segment in enumerate(text_segments):
+        segment_of_char.extend([segment_index] * sum(1 for ch in segment if ch.isalnum()))
+
+    ranges = [None] * len(text_segments)
+    if not text_segments:
+        return ranges
+
+    char_cursor = 0
+    last_char = len(segment_of_char) - 1
+    for word_index, word in enumerate(words):
+        length = sum(1 for ch in word if ch.isalnum())
+        if length:
+            segment_index = segment_of_char[min(char_cursor, last_char)] if segment_of_char else 0
+        else:
+            segment_index = segment_of_char[min(max(char_cursor - 1, 0), last_char)] if segment_of_char else 0
+        char_cursor += length
+
+        current = ranges[segment_index]
+        ranges[segment_index] = (word_index, word_index) if current is None else (current[0], word_index)
+    return ranges
+
+def results_to_cues(results):
+    """Yields one Cue per aligned transcript segment, consuming the results one at a time."""
     idx = 1
     
-    for result in json_data['results']:
+    for result in results:
         if 'words' in result['alternatives'][0]:
             words_info = result['alternatives'][0]['words']
             transcript = result['alternatives'][0]['transcript']
 
-            # Split the transcript by punctuation
-            text_segments = split_transcript_by_punctuation(transcript)
-            
-            segment_start_index = 0
-            for segment in text_segments:
-                segment_start_time = None
-                segment_end_time = None
-                segment_text = []
-
-                for word_info in words_info[segment_start_index:]:
-                    word = clean_text(word_info['word'])
-                    start_offset = word_info.get('startOffset', "0s")
-                    end_offset = word_info.get('endOffset', "0s")
-
-                    start_seconds, start_nanos = parse_offset(start_offset)
-                    end_seconds, end_nanos = parse_offset(end_offset)
+            # Convert all word offsets of this result in one go
+            start_ms = ns_to_ms(parse_offsets_ns([word_info.get('startOffset', "0s") for word_info in words_info]))
+            end_ms = ns_to_ms(parse_offsets_ns([word_info.get('endOffset', "0s") for word_info in words_info]))
+            words = [clean_text(word_info['word']) for word_info in words_info]
 
-                    if segment_start_time is None:
-                        segment_start_time = (start_seconds, start_nanos)
-                    segment_end_time = (end_seconds, end_nanos)
-
-                    segment_text.append(word)
-                    segment_start_index += 1
-
-                    if word in segment:
-                        break
+            # Split the transcript by punctuation and align the words to the segments
+            text_segments = split_transcript_by_punctuation(transcript)
+            word_ranges = align_words_to_segments(text_segments, words)
 
-                start_time_str = format_timestamp(*segment_start_time)
-                end_time_str = format_timestamp(*segment_end_time)
+            for word_range in word_ranges:
+                if word_range is None:
+                    continue
+                first_index, last_index = word_range
 
-                # Create the SRT block
-                srt_content.append(f"{idx}")
-                srt_content.append(f"{start_time_str} --> {end_time_str}")
-                srt_content.append("".join(segment_text).strip())
-                srt_content.append("")  # Blank line for SRT format
+                segment_text = "".join(words[first_index:last_index + 1]).strip()
+                yield Cue(idx, int(start_ms[first_index]), int(end_ms[last_index]), segment_text)
 
                 idx += 1
 
-    # Write to the SRT file
-    with open(output_srt_file, 'w', encoding='utf-8') as f:
-        f.write("\n".join(srt_content))
+def convert_to_srt(json_data, output_srt_file):
+    """Converts JSON data to SRT format."""
+    write_srt(results_to_cues(json_data['results']), output_srt_file)
 
-# Load JSON data from Google API
-json_file_path = 'transcripts-extracted_audio_transcript_66c76096-0000-25bb-a936-582429bd7fb4.json'
-output_srt_path = 'output_subtitle.srt'
+def convert_file_to_srt(json_file_path, output_srt_file):
+    """Converts a transcript JSON file to SRT format, streaming one result at a time."""
+    write_srt(results_to_cues(iter_results(json_file_path)), output_srt_file)
 
-with open(json_file_path, 'r', encoding='utf-8') as f:
-    json_data = json.load(f)
+if __name__ == "__main__":
+    # Transcript JSON from Google API
+    json_file_path = 'transcripts-extracted_audio_transcript_66c76096-0000-25bb-a936-582429bd7fb4.json'
+    output_srt_path = 'output_subtitle.srt'
 
-# Convert JSON to SRT
-convert_to_srt(json_data, output_srt_path)
+    # Convert JSON to SRT
+    convert_file_to_srt(json_file_path, output_srt_path)
 
-print(f"SRT file created at: {output_srt_path}")
+    print(f"SRT file created at: {output_srt_path}")
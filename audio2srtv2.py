@@ -1,22 +1,8 @@
-import json
 import re
 
-def parse_offset(offset_str):
-    """Converts offset string (e.g., '0.200s') to seconds and nanoseconds."""
-    if offset_str is None:
-        return 0, 0  # Default value for missing offsets
-    seconds = float(offset_str.replace('s', ''))
-    whole_seconds = int(seconds)
-    nanos = int((seconds - whole_seconds) * 1e9)
-    return whole_seconds, nanos
-
-def format_timestamp(seconds, nanos):
-    """Formats time given in seconds and nanoseconds to SRT timestamp format."""
-    total_seconds = seconds + nanos / 1e9
-    hours, remainder = divmod(total_seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    milliseconds = int((seconds % 1) * 1000)
-    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02},{milliseconds:03}"
+from srtlib import Cue, write_srt
+from timestamps import ns_to_ms, parse_offsets_ns
+from transcript_stream import iter_results
 
 def split_transcript_by_punctuation(transcript):
     """Splits transcript by punctuation (Chinese and comma) while keeping punctuation attached to the sentence."""
@@ -28,16 +14,19 @@ def get_offset(word_info, key, default="0s"):
     """Safely retrieves the offset from word_info, returns default if not present."""
     return word_info.get(key, default)
 
-def convert_to_srt(json_data, output_srt_file):
-    """Converts JSON data to SRT format."""
-    srt_content = []
+def results_to_cues(results):
+    """Yields one Cue per transcript segment, consuming the results one at a time."""
     idx = 1
     
-    for result in json_data['results']:
+    for result in results:
         if 'words' in result['alternatives'][0]:
             words_info = result['alternatives'][0]['words']
             transcript = result['alternatives'][0]['transcript']
             
+            # Convert all word offsets of this result in one go
+            start_ms = ns_to_ms(parse_offsets_ns([get_offset(word_info, 'startOffset') for word_info in words_info]))
+            end_ms = ns_to_ms(parse_offsets_ns([get_offset(word_info, 'endOffset') for word_info in words_info]))
+
             # Split the transcript by punctuation
             text_segments = split_transcript_by_punctuation(transcript)
             
@@ -50,39 +39,29 @@ def convert_to_srt(json_data, output_srt_file):
                     break
                 
                 # Get the start and end time for this segment
-                start_word = words_info[segment_start_index]
                 end_word_index = min(segment_start_index + word_count - 1, len(words_info) - 1)
-                end_word = words_info[end_word_index]
-                
-                # Use get_offset to safely retrieve the offsets
-                start_seconds, start_nanos = parse_offset(get_offset(start_word, 'startOffset'))
-                end_seconds, end_nanos = parse_offset(get_offset(end_word, 'endOffset'))
-                
-                start_time_str = format_timestamp(start_seconds, start_nanos)
-                end_time_str = format_timestamp(end_seconds, end_nanos)
                 
                 # Create the SRT block
-                srt_content.append(f"{idx}")
-                srt_content.append(f"{start_time_str} --> {end_time_str}")
-                srt_content.append(segment.strip())
-                srt_content.append("")  # Blank line for SRT format
+                yield Cue(idx, int(start_ms[segment_start_index]), int(end_ms[end_word_index]), segment.strip())
                 
                 # Update index and segment start index
                 idx += 1
                 segment_start_index += word_count
 
-    # Write to the SRT file
-    with open(output_srt_file, 'w', encoding='utf-8') as f:
-        f.write("\n".join(srt_content))
+def convert_to_srt(json_data, output_srt_file):
+    """Converts JSON data to SRT format."""
+    write_srt(results_to_cues(json_data['results']), output_srt_file)
 
-# Load JSON data
-json_file_path = 'transcripts-extracted_audio_transcript_66c76096-0000-25bb-a936-582429bd7fb4.json'
-output_srt_path = 'output_subtitle.srt'
+def convert_file_to_srt(json_file_path, output_srt_file):
+    """Converts a transcript JSON file to SRT format, streaming one result at a time."""
+    write_srt(results_to_cues(iter_results(json_file_path)), output_srt_file)
 
-with open(json_file_path, 'r', encoding='utf-8') as f:
-    json_data = json.load(f)
+if __name__ == "__main__":
+    # Transcript JSON
+    json_file_path = 'transcripts-extracted_audio_transcript_66c76096-0000-25bb-a936-582429bd7fb4.json'
+    output_srt_path = 'output_subtitle.srt'
 
-# Convert JSON to SRT
-convert_to_srt(json_data, output_srt_path)
+    # Convert JSON to SRT
+    convert_file_to_srt(json_file_path, output_srt_path)
 
-print(f"SRT file created at: {output_srt_path}")
+    print(f"SRT file created at: {output_srt_path}")
@@ -0,0 +1,78 @@
+import json
+import subprocess
+import wave
+
+def probe_audio(audio_file_path):
+    """Reads sample rate, channel count and duration of the first audio stream from the file headers, without decoding.
+
+    WAV files are read with the wave module; anything else goes through ffprobe.
+    Returns a dict with 'sample_rate', 'channels' and 'duration' (seconds).
+    """
+    try:
+        with wave.open(audio_file_path, 'rb') as wav:
+            return {
+                'sample_rate': wav.getframerate(),
+                'channels': wav.getnchannels(),
+                'duration': wav.getnframes() / wav.getframerate(),
+            }
+    except (wave.Error, EOFError):
+        pass
+
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',  # First audio stream only
+        '-show_entries', 'stream=sample_rate,channels,duration:format=duration',
+        '-of', 'json',
+        audio_file_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    info = json.loads(result.stdout)
+    if not info.get('streams'):
+        raise ValueError(f"No audio stream found in {audio_file_path}")
+    stream = info['streams'][0]
+    duration = stream.get('duration') or info.get('format', {}).get('duration') or 0
+    return {
+        'sample_rate': int(stream['sample_rate']),
+        'channels': int(stream['channels']),
+        'duration': float(duration),
+    }
+
+def iter_pcm(audio_file_path, sample_rate=None, channels=1, chunk_size=1 << 20):
+    """Decodes audio once with ffmpeg, downmixing and resampling in the same pass, and yields 16-bit PCM chunks.
+
+    sample_rate=None keeps the source rate. Nothing is written to disk.
+    """
+    cmd = [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', audio_file_path,  # Input file
+        '-vn',  # Ignore any video stream
+        '-ac', str(channels),  # Downmix
+        *(['-ar', str(sample_rate)] if sample_rate else []),  # Resample
+        '-f', 's16le',  # Raw signed 16-bit little-endian PCM (LINEAR16)
+        '-'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+
+def load_pcm(audio_file_path, sample_rate=None, channels=1):
+    """Decodes audio to mono (by default) LINEAR16 PCM in memory and returns (pcm_bytes, sample_rate)."""
+    if sample_rate is None:
+        sample_rate = probe_audio(audio_file_path)['sample_rate']
+    pcm = bytearray()
+    for chunk in iter_pcm(audio_file_path, sample_rate=sample_rate, channels=channels):
+        pcm += chunk
+    return bytes(pcm), sample_rate
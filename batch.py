@@ -0,0 +1,238 @@
+import argparse
+import heapq
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pipeline import EpisodeRun, episode_pipeline
+from retry import backoff_delay
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.avi', '.flv', '.ts')
+
+def load_episodes(path):
+    """Reads episodes from a directory of videos or a JSON manifest.
+
+    The manifest is a list of {"video": path, "name": optional, "priority": optional};
+    relative paths are resolved against the manifest's directory. Lower priority
+    numbers run first. Returns a list of (name, video_path, priority).
+    """
+    if os.path.isdir(path):
+        videos = sorted(file for file in os.listdir(path) if file.lower().endswith(VIDEO_EXTENSIONS))
+        return [(os.path.splitext(file)[0], os.path.abspath(os.path.join(path, file)), 0) for file in videos]
+
+    with open(path, 'r', encoding='utf-8') as file:
+        entries = json.load(file)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    episodes = []
+    for entry in entries:
+        video = os.path.join(base_dir, entry['video'])
+        name = entry.get('name') or os.path.splitext(os.path.basename(video))[0]
+        episodes.append((name, os.path.abspath(video), entry.get('priority', 0)))
+    names = [name for name, _, _ in episodes]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate episode names in {path}")
+    return episodes
+
+class JobStore:
+    """SQLite record of every (episode, stage) job, so a crashed batch resumes where it stopped.
+
+    Jobs that were running when the process died, and jobs that failed or were blocked,
+    go back to pending on the next start; finished jobs stay finished.
+    """
+
+    def __init__(self, db_path='batch_state.sqlite'):
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'episode TEXT NOT NULL, stage TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL, '
+            'error TEXT, updated REAL NOT NULL, PRIMARY KEY (episode, stage))'
+        )
+        self._db.commit()
+
+    def prepare(self, jobs):
+        """Adds the (episode, stage) jobs not seen before and requeues unfinished ones. Returns {job: status}."""
+        now = time.time()
+        self._db.executemany("INSERT OR IGNORE INTO jobs VALUES (?, ?, 'pending', 0, NULL, ?)",
+                             [(episode, stage, now) for episode, stage in jobs])
+        self._db.executemany("UPDATE jobs SET status = 'pending', attempts = 0 "
+                             "WHERE episode = ? AND stage = ? AND status != 'done'", list(jobs))
+        self._db.commit()
+        return {(episode, stage): status
+                for episode, stage, status in self._db.execute('SELECT episode, stage, status FROM jobs')
+                if (episode, stage) in jobs}
+
+    def set_status(self, episode, stage, status, error=None, attempt=False):
+        self._db.execute('UPDATE jobs SET status = ?, error = ?, attempts = attempts + ?, updated = ? '
+                         'WHERE episode = ? AND stage = ?',
+                         (status, error, 1 if attempt else 0, time.time(), episode, stage))
+        self._db.commit()
+
+    def summary(self):
+        return dict(self._db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def close(self):
+        self._db.close()
+
+class BatchScheduler:
+    """Runs many episodes through one pipeline with a global priority queue per resource class.
+
+    CPU-bound stages (x264, ffmpeg) and I/O-bound stages (speech, translation and TTS
+    APIs) get separate worker pools, so API-bound work keeps flowing while the encoders
+    are busy and vice versa. Ready jobs are ordered by episode priority, then by how
+    far along the pipeline the stage is (finishing episodes beats starting new ones),
+    then by episode order. Job state is persisted in a JobStore after every change.
+
+    CPU stages also draw their core cost (Stage.cores, capped at the budget) from a
+    budget of cores, and are told how many cores they got, so concurrent encodes
+    together never use more than the budget. A failed job is retried no sooner than
+    its exponential backoff delay.
+    """
+
+    def __init__(self, pipeline, episodes, work_dir='episodes', cpu_workers=2, io_workers=8, store=None, retries=1,
+                 recheck=False, cores=None, backoff=5.0):
+        self.pipeline = pipeline
+        self.episodes = episodes
+        self.retries = retries
+        self.recheck = recheck
+        self.cores = cores or os.cpu_count() or 1
+        self.backoff = backoff
+        os.makedirs(work_dir, exist_ok=True)
+        self.store = store or JobStore(os.path.join(work_dir, 'batch_state.sqlite'))
+        self.runs = {name: EpisodeRun(pipeline, name, {'source_video': video}, work_dir)
+                     for name, video, _ in episodes}
+        self.slots = {'cpu': cpu_workers, 'io': io_workers}
+        self.depth = {}
+        for stage in pipeline.order:
+            self.depth[stage] = 1 + max((self.depth[dependency] for dependency in pipeline.dependencies(stage)), default=0)
+
+    def _priority(self, episode_index, priority, stage):
+        return priority, -self.depth[stage], episode_index
+
+    def _core_cost(self, stage):
+        stage = self.pipeline.stages[stage]
+        return min(stage.cores, self.cores) if stage.resource == 'cpu' else 0
+
+    def run(self):
+        """Runs every job to completion; returns {episode: {stage: status}}."""
+        jobs = {(name, stage) for name, _, _ in self.episodes for stage in self.pipeline.order}
+        status = self.store.prepare(jobs)
+        if self.recheck:
+            # 不信任记录的完成状态，交给各阶段的内容哈希判断是否需要重跑
+            status = dict.fromkeys(status, 'pending')
+        order = {name: (index, priority) for index, (name, _, priority) in enumerate(self.episodes)}
+        attempts = dict.fromkeys(jobs, 0)
+        not_before = {}  # 失败后等待重试的任务 -> 最早可重试的时间
+
+        queues = {'cpu': [], 'io': []}
+        queued = set()
+        running = {}
+        executors = {resource: ThreadPoolExecutor(max_workers=slots) for resource, slots in self.slots.items()}
+        busy = dict.fromkeys(self.slots, 0)
+        free_cores = self.cores
+
+        def enqueue_ready():
+            # 按流水线顺序检查，依赖失败的阶段一次就能逐级标记为 blocked
+            for episode, stage in sorted(jobs, key=lambda job: self.pipeline.order.index(job[1])):
+                if status[(episode, stage)] != 'pending' or (episode, stage) in queued:
+                    continue
+                if not_before.get((episode, stage), 0) > time.time():
+                    continue
+                not_before.pop((episode, stage), None)
+                dependencies = [status[(episode, dependency)] for dependency in self.pipeline.dependencies(stage)]
+                if any(dependency in ('failed', 'blocked') for dependency in dependencies):
+                    status[(episode, stage)] = 'blocked'
+                    self.store.set_status(episode, stage, 'blocked')
+                elif all(dependency == 'done' for dependency in dependencies):
+                    index, priority = order[episode]
+                    resource = self.pipeline.stages[stage].resource
+                    heapq.heappush(queues[resource], (self._priority(index, priority, stage), episode, stage))
+                    queued.add((episode, stage))
+
+        try:
+            while True:
+                enqueue_ready()
+                for resource, queue in queues.items():
+                    # 队首任务的核数不够时就等，不让后面的小任务一直插队
+                    while queue and busy[resource] < self.slots[resource] and self._core_cost(queue[0][2]) <= free_cores:
+                        _, episode, stage = heapq.heappop(queue)
+                        queued.discard((episode, stage))
+                        status[(episode, stage)] = 'running'
+                        self.store.set_status(episode, stage, 'running', attempt=True)
+                        attempts[(episode, stage)] += 1
+                        cores = self._core_cost(stage)
+                        running[executors[resource].submit(self.runs[episode].run_stage, stage, cores or None)] = \
+                            (episode, stage)
+                        busy[resource] += 1
+                        free_cores -= cores
+                if not running and not not_before:
+                    break
+                timeout = max(0.0, min(not_before.values()) - time.time()) if not_before else None
+                if not running:
+                    time.sleep(timeout)
+                    continue
+                finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    episode, stage = running.pop(future)
+                    busy[self.pipeline.stages[stage].resource] -= 1
+                    free_cores += self._core_cost(stage)
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        if attempts[(episode, stage)] <= self.retries:
+                            delay = backoff_delay(attempts[(episode, stage)] - 1, self.backoff)
+                            print(f"[{episode}] {stage} failed ({e}), retrying in {delay:.1f}s")
+                            status[(episode, stage)] = 'pending'
+                            not_before[(episode, stage)] = time.time() + delay
+                            self.store.set_status(episode, stage, 'pending', error=str(e))
+                        else:
+                            print(f"[{episode}] {stage} failed: {e}")
+                            status[(episode, stage)] = 'failed'
+                            self.store.set_status(episode, stage, 'failed', error=str(e))
+                    else:
+                        print(f"[{episode}] {stage} {outcome}")
+                        status[(episode, stage)] = 'done'
+                        self.store.set_status(episode, stage, 'done')
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        results = {name: {} for name, _, _ in self.episodes}
+        for (episode, stage), job_status in status.items():
+            results[episode][stage] = job_status
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Dub a batch of episodes with one global, resumable job scheduler.")
+    parser.add_argument('episodes', help="Directory of source videos, or a JSON manifest of episodes")
+    parser.add_argument('--work-dir', default='episodes', help="Per-episode artifacts go to WORK_DIR/<episode>/")
+    parser.add_argument('--font', default='/System/Library/Fonts/PingFang.ttc', help="Subtitle font")
+    parser.add_argument('--lang', default='en', help="Target language")
+    parser.add_argument('--cpu-workers', type=int, default=2, help="Encoding stages running at once")
+    parser.add_argument('--cores', type=int, default=os.cpu_count() or 1, help="Cores shared by the encoding stages")
+    parser.add_argument('--io-workers', type=int, default=8, help="API-bound stages running at once")
+    parser.add_argument('--retries', type=int, default=1, help="Retries per failed job")
+    parser.add_argument('--backoff', type=float, default=5.0, help="Seconds before the first retry, doubling after")
+    parser.add_argument('--recheck', action='store_true', help="Re-verify finished jobs against their inputs")
+    args = parser.parse_args()
+
+    episodes = load_episodes(args.episodes)
+    # 每个编码阶段默认分到 cores / cpu_workers 个核，cpu_workers 个编码可以同时进行
+    pipeline = episode_pipeline(args.font, target_language=args.lang,
+                                encode_cores=max(1, args.cores // args.cpu_workers))
+    scheduler = BatchScheduler(pipeline, episodes, work_dir=args.work_dir, cpu_workers=args.cpu_workers,
+                               io_workers=args.io_workers, retries=args.retries, recheck=args.recheck,
+                               cores=args.cores, backoff=args.backoff)
+    try:
+        results = scheduler.run()
+    finally:
+        scheduler.store.close()
+    failed = [name for name, statuses in results.items() if 'failed' in statuses.values()]
+    print(f"{len(results) - len(failed)} of {len(results)} episodes finished")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
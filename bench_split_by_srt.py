@@ -0,0 +1,40 @@
+import argparse
+import os
+import shutil
+import time
+
+from split_by_srt import cut_video_with_audio, cut_video_with_audio_single_pass, parse_srt
+
+def run_benchmark(video_file, srt_file, work_dir):
+    """Times the per-cue loop against the single-pass segmenter on the same input."""
+    results = {}
+    for name, cut in (('per-cue', cut_video_with_audio), ('single-pass', cut_video_with_audio_single_pass)):
+        output_dir = os.path.join(work_dir, name)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        start = time.perf_counter()
+        cut(video_file, srt_file, output_dir)
+        elapsed = time.perf_counter() - start
+        segments = sorted(file for file in os.listdir(output_dir) if file.endswith('.mp4'))
+        results[name] = (elapsed, segments)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-cue ffmpeg cutting against the single-pass segmenter.")
+    parser.add_argument('video_file', help="Preprocessed video to cut")
+    parser.add_argument('srt_file', help="SRT file with the cue times")
+    parser.add_argument('--work-dir', default='bench_segments', help="Directory for the benchmark outputs")
+    args = parser.parse_args()
+
+    cue_count = len(parse_srt(args.srt_file))
+    results = run_benchmark(args.video_file, args.srt_file, args.work_dir)
+
+    print(f"Cues: {cue_count}")
+    for name, (elapsed, segments) in results.items():
+        print(f"{name:>12}: {elapsed:8.2f}s, {len(segments)} segments, {elapsed / max(cue_count, 1) * 1000:.1f} ms/cue")
+    if results['per-cue'][1] != results['single-pass'][1]:
+        print("Warning: the two modes produced different segment layouts")
+    speedup = results['per-cue'][0] / max(results['single-pass'][0], 1e-9)
+    print(f"Speedup: {speedup:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+
+_SAMPLE_BYTES = 1 << 20
+
+def file_fingerprint(path):
+    """Fingerprints a (possibly huge) media file from its size, mtime and the first and last MiB of content."""
+    stat = os.stat(path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    with open(path, 'rb') as file:
+        digest.update(file.read(_SAMPLE_BYTES))
+        if stat.st_size > _SAMPLE_BYTES:
+            file.seek(max(_SAMPLE_BYTES, stat.st_size - _SAMPLE_BYTES))
+            digest.update(file.read(_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+def segment_fingerprint(**parts):
+    """Hashes everything an output segment depends on (source fingerprint, cue times, text, encode settings...)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class BuildManifest:
+    """Records, per output file, the fingerprint of the inputs it was built from.
+
+    An output is up to date when it exists and its recorded fingerprint matches the
+    current one, so a rebuild only redoes the segments whose cue, source or settings
+    changed. The manifest is a JSON file written atomically.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def is_fresh(self, output_file, fingerprint):
+        return self.entries.get(output_file) == fingerprint and os.path.exists(output_file)
+
+    def record(self, output_file, fingerprint):
+        self.entries[output_file] = fingerprint
+
+    def forget(self, output_file):
+        self.entries.pop(output_file, None)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.entries, file, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from moviepy.editor import AudioClip, AudioFileClip, VideoClip, VideoFileClip
+
+from fast_concat import probe_all, probe_video
+
+AUDIO_FPS = 44100  # AudioFileClip 默认采样率
+AUDIO_CHANNELS = 2  # AudioFileClip 默认输出双声道
+
+class ReaderPool:
+    """Opens MoviePy readers for a list of files on demand and keeps only a small window open.
+
+    get(i) returns the reader of paths[i], opening it if needed. Readers for
+    i+1..i+lookahead are opened in the background so the next segment is warm when
+    the timeline reaches it, and every reader outside [i, i+lookahead] is closed, so
+    the number of ffmpeg processes and file handles stays bounded however long the
+    timeline is.
+    """
+
+    def __init__(self, paths, opener, lookahead=1):
+        self.paths = list(paths)
+        self.opener = opener
+        self.lookahead = lookahead
+        self.opened = 0
+        self._readers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _open(self, index):
+        if index not in self._readers:
+            self._readers[index] = self._executor.submit(self.opener, self.paths[index])
+            self.opened += 1
+        return self._readers[index]
+
+    def get(self, index):
+        with self._lock:
+            window = range(index, min(index + self.lookahead, len(self.paths) - 1) + 1)
+            for stale in [i for i in self._readers if i not in window]:
+                self._readers.pop(stale).add_done_callback(_close_reader)
+            future = self._open(index)
+            for upcoming in window[1:]:
+                self._open(upcoming)
+        return future.result()
+
+    def close(self):
+        with self._lock:
+            for future in self._readers.values():
+                future.add_done_callback(_close_reader)
+            self._readers.clear()
+        self._executor.shutdown(wait=True)
+
+def _close_reader(future):
+    if future.exception() is None:
+        future.result().close()
+
+def lazy_video_clip(pool, index, duration, size, fps):
+    """A VideoClip that reads its frames from pool.get(index) only when they are requested."""
+    # 不把 make_frame 传给构造函数，否则 MoviePy 会立即读取第 0 帧
+    clip = VideoClip(duration=duration)
+    clip.make_frame = lambda t: pool.get(index).get_frame(t)
+    clip.size = size
+    clip.fps = fps
+    return clip
+
+def lazy_audio_clip(pool, index, duration, source=lambda reader: reader):
+    """An AudioClip that reads source(pool.get(index)) only when samples are requested."""
+    # 同样不传 make_frame，避免构造时就打开读取器
+    clip = AudioClip(duration=duration, fps=AUDIO_FPS)
+    clip.make_frame = lambda t: source(pool.get(index)).get_frame(t)
+    clip.nchannels = AUDIO_CHANNELS
+    return clip
+
+def lazy_video_opener(video_files, fps, audio=True, lookahead=1):
+    """Returns open_clip and the pool to close afterwards; open_clip(i) is a lazy clip of video_files[i].
+
+    open_clip probes the file with ffprobe (unless given its probe), so an unreadable
+    file raises there and the caller can skip that segment; no reader is opened until a
+    frame is needed.
+    """
+    pool = ReaderPool(video_files, lambda path: VideoFileClip(path, audio=audio), lookahead=lookahead)
+
+    def open_clip(index, probe=None):
+        probe = probe or probe_video(video_files[index])
+        clip = lazy_video_clip(pool, index, probe['duration'], (probe['width'], probe['height']), fps)
+        if audio:
+            clip = clip.set_audio(lazy_audio_clip(pool, index, probe['duration'], source=lambda reader: reader.audio))
+        return clip
+
+    return open_clip, pool
+
+def lazy_video_clips(video_files, fps, audio=True, lookahead=1, probes=None):
+    """Returns lazy clips for video_files (with their own audio when audio=True) and the pool to close afterwards.
+
+    Durations and sizes come from ffprobe (or from probes, if the caller already has
+    them), so no reader is opened until a frame is needed.
+    """
+    open_clip, pool = lazy_video_opener(video_files, fps, audio=audio, lookahead=lookahead)
+    probes = probes if probes is not None else probe_all(video_files)
+    return [open_clip(index, probe) for index, probe in enumerate(probes)], pool
+
+def lazy_audio_clips(audio_files, durations, lookahead=1):
+    """Returns lazy clips for audio_files with known durations and the pool to close afterwards."""
+    pool = ReaderPool(audio_files, AudioFileClip, lookahead=lookahead)
+    clips = [lazy_audio_clip(pool, index, duration) for index, duration in enumerate(durations)]
+    return clips, pool
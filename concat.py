@@ -1,29 +1,14 @@
-from moviepy.editor import VideoFileClip, concatenate_videoclips, TextClip, CompositeVideoClip
+from moviepy.editor import concatenate_videoclips
 import os
-import re
+
+from clip_pool import lazy_video_opener
+from fast_concat import fast_concat
+from srtlib import iter_srt
+from subtitle_atlas import SubtitleAtlas, overlay_subtitle
 
 def parse_srt_for_subtitles(srt_file):
     """Parses the SRT file and returns a list of tuples (start_time, end_time, text)."""
-    with open(srt_file, 'r', encoding="utf-8") as file:
-        content = file.read()
-    
-    pattern = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-    matches = pattern.findall(content)
-
-    subtitles = []
-    for match in matches:
-        start_time = hms_to_seconds(match[0].replace(',', '.'))
-        end_time = hms_to_seconds(match[1].replace(',', '.'))
-        text = match[2].replace('\n', ' ').strip()
-        subtitles.append((start_time, end_time, text))
-    
-    return subtitles
-
-def hms_to_seconds(hms):
-    """Converts a time string HH:MM:SS,ms to seconds."""
-    h, m, s = hms.split(':')
-    s, ms = s.split('.')
-    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+    return [(cue.start, cue.end, cue.text.replace('\n', ' ')) for cue in iter_srt(srt_file)]
 
 def crop_video(video, crop_bottom=50):
     """Crops the video symmetrically on both sides and removes a portion from the bottom."""
@@ -43,25 +28,25 @@ def create_final_video_with_subtitles(video_files, output_file, srt_file, font_p
     
     selected_subtitles = [subtitles[i] for i in subtitle_indices]  # 选择对应的字幕段落
 
+    # 一次性渲染所有字幕图层，指定支持中文的字体
+    atlas = SubtitleAtlas(font_path, fontsize=28, color='white')
+    atlas.render_all([text for _, _, text in selected_subtitles])
+
+    # 读取器在时间线走到对应片段时才打开，用完即关闭
+    open_clip, pool = lazy_video_opener(video_files, fps)
+
     current_time = 0  # 用于记录每个片段在合成视频中的起始时间
     for idx, file in enumerate(video_files):
         try:
-            clip = VideoFileClip(file).set_fps(fps)  # 设置帧率
-            clip = crop_video(clip, crop_bottom=crop_bottom)  # 裁剪视频
+            clip = crop_video(open_clip(idx), crop_bottom=crop_bottom)  # 裁剪视频（读不了的片段在这里跳过）
             clip_duration = clip.duration
 
             # 获取对应的字幕段落
             if idx < len(selected_subtitles):
                 start_time, end_time, text = selected_subtitles[idx]
 
-                # 创建字幕文本的时间段，指定支持中文的字体
-                txt_clip = (TextClip(text, fontsize=28, color='white', font=font_path)
-                            .set_position(('center', 'bottom'))
-                            .set_start(0)
-                            .set_duration(clip_duration))
-                
-                # 将字幕与视频片段合成
-                clip_with_subtitle = CompositeVideoClip([clip, txt_clip]).set_start(current_time)
+                # 将字幕贴到视频片段底部（只混合字幕所在区域）
+                clip_with_subtitle = overlay_subtitle(clip, atlas.sprite(text)).set_start(current_time)
                 clips.append(clip_with_subtitle)
             else:
                 clips.append(clip.set_start(current_time))
@@ -74,6 +59,7 @@ def create_final_video_with_subtitles(video_files, output_file, srt_file, font_p
     
     if not clips:
         print("No valid video clips found.")
+        pool.close()
         return
 
     # 合并所有视频片段
@@ -86,6 +72,21 @@ def create_final_video_with_subtitles(video_files, output_file, srt_file, font_p
         
     except Exception as e:
         print(f"Error writing final video: {e}")
+    finally:
+        final_clip.close()
+        pool.close()
+
+def create_final_video_with_subtitles_fast(video_files, output_file, srt_file, font_path, fps=24, crop_bottom=50,
+                                           subtitle_indices=(0, 10, 20, 30), subtitle_mode='burn'):
+    """Same output as create_final_video_with_subtitles, but joined by the ffmpeg concat demuxer in one pass."""
+    subtitles = parse_srt_for_subtitles(srt_file)
+    if max(subtitle_indices) >= len(subtitles):
+        raise ValueError("The subtitle file does not have enough entries to match the selected video clips.")
+    texts = [subtitles[i][2] for i in subtitle_indices][:len(video_files)]
+
+    fast_concat(video_files, output_file, texts, subtitle_mode=subtitle_mode, font_path=font_path,
+                crop_bottom=crop_bottom, fps=fps)
+    print(f"Final video created: {output_file}")
 
 # 指定视频片段的目录和字幕文件路径
 video_directory = 'video_segments'
@@ -99,5 +100,5 @@ all_video_files = sorted([os.path.join(video_directory, file) for file in os.lis
 # 只选择1, 11, 21, 31 四个片段
 selected_video_files = [all_video_files[i] for i in [0, 10, 20, 30]]
 
-# 创建带有字幕的最终视频
-create_final_video_with_subtitles(selected_video_files, output_video_file, srt_file_path, font_path, crop_bottom=60)
+# 创建带有字幕的最终视频（片段编码参数一致，直接用 ffmpeg 拼接并烧录字幕）
+create_final_video_with_subtitles_fast(selected_video_files, output_video_file, srt_file_path, font_path, crop_bottom=60)
@@ -1,52 +1,56 @@
-from moviepy.editor import VideoFileClip, concatenate_videoclips, CompositeVideoClip, AudioFileClip, TextClip
-from gtts import gTTS
+from moviepy.editor import concatenate_videoclips
 import os
-import re
+
+from clip_pool import lazy_audio_clips, lazy_video_clips, lazy_video_opener
+from dub_track import DubTrack
+from fast_concat import probe_video
+from parallel_encode import encode_parallel
+from frame_transform import crop_scale_clip
+from build_manifest import BuildManifest, file_fingerprint, segment_fingerprint
+from smart_cut import ffmpeg_concat_copy
+from srtlib import iter_srt
+from subtitle_atlas import SubtitleAtlas, overlay_subtitle
+from time_stretch import fit_files
+from tts_cache import RateLimiter, TTSCache, synthesize_lines
 
 def parse_srt_for_subtitles(srt_file):
     """Parses the SRT file and returns a list of tuples (start_time, end_time, text)."""
-    with open(srt_file, 'r', encoding="utf-8") as file:
-        content = file.read()
+    return [(cue.start, cue.end, cue.text.replace('\n', ' ')) for cue in iter_srt(srt_file)]
+
+def generate_audio_for_subtitles(subtitles, lang='en', cache=None, max_workers=8, requests_per_second=5):
+    """Generates audio files for each subtitle using Google TTS, reusing cached lines from earlier runs."""
+    cache = cache or TTSCache('tts_cache', rate_limiter=RateLimiter(requests_per_second, burst=max_workers))
+    audio_files, durations = synthesize_lines(cache, [text for _, _, text in subtitles], lang, max_workers=max_workers)
+    print(f"TTS cache: {cache.hits} hits, {cache.misses} synthesized")
+    return audio_files, durations
+
+def build_segment_clip(clip, duration, text, font_path, crop_bottom=50, atlas=None, audio=None):
+    """Builds one dubbed segment: cropped and rescaled video retimed to duration, the subtitle text and optional audio.
+
+    clip (and audio, if given) are the segment's video and TTS clips (lazy ones from
+    clip_pool keep their readers closed until rendering reaches them). Pass a shared
+    SubtitleAtlas to reuse subtitle sprites across segments.
+    """
+    width, height = clip.size  # 获取原始尺寸
     
-    pattern = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-    matches = pattern.findall(content)
-
-    subtitles = []
-    for match in matches:
-        start_time = hms_to_seconds(match[0].replace(',', '.'))
-        end_time = hms_to_seconds(match[1].replace(',', '.'))
-        text = match[2].replace('\n', ' ').strip()
-        subtitles.append((start_time, end_time, text))
+    # 裁剪底部并拉伸回原始尺寸，一步完成（插值表按尺寸预先计算）
+    clip = crop_scale_clip(clip, (0, 0, width, height - crop_bottom), (width, height))
     
-    return subtitles
-
-def hms_to_seconds(hms):
-    """Converts a time string HH:MM:SS,ms to seconds."""
-    h, m, s = hms.split(':')
-    s, ms = s.split('.')
-    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-
-def generate_audio_for_subtitles(subtitles, lang='en'):
-    """Generates audio files for each subtitle using Google TTS."""
-    audio_files = []
-    durations = []
-    for i, (_, _, text) in enumerate(subtitles):
-        tts = gTTS(text=text, lang=lang)
-        audio_file = f"audio_{i}.mp3"
-        tts.save(audio_file)
-        audio_clip = AudioFileClip(audio_file)
-        audio_files.append(audio_file)
-        durations.append(audio_clip.duration)
-    return audio_files, durations
+    # 调整视频片段的时长以匹配音频时长，并设置为视频片段的音频
+    clip = clip.set_duration(duration)
+    if audio is not None:
+        clip = clip.set_audio(audio)
 
-def crop_video(video, crop_bottom=50):
-    """Crops the video symmetrically on both sides and removes a portion from the bottom."""
-    width, height = video.size
-    cropped_video = video.crop(x1=0, y1=0, x2=width, y2=height - crop_bottom)
-    return cropped_video
+    # 将字幕贴到视频片段底部（只混合字幕所在区域），指定支持中文的字体
+    atlas = atlas or SubtitleAtlas(font_path, fontsize=28, color='white')
+    return overlay_subtitle(clip, atlas.sprite(text))
 
-def create_final_video_with_tts(video_files, output_file, srt_file, font_path, fps=24, crop_bottom=50):
-    clips = []
+def plan_tts_timeline(video_files, srt_file):
+    """Pairs the selected segments with their subtitle lines and synthesizes the TTS lines once.
+
+    Returns (video_files, texts, audio_files, durations), trimmed to the segments that
+    have a subtitle line; segment i runs for durations[i], the length of its TTS line.
+    """
     subtitles = parse_srt_for_subtitles(srt_file)
     
     # 检查字幕段落数量是否足够
@@ -55,75 +59,234 @@ def create_final_video_with_tts(video_files, output_file, srt_file, font_path, f
         raise ValueError("The subtitle file does not have enough entries to match the selected video clips.")
     
     selected_subtitles = [subtitles[i] for i in subtitle_indices]  # 选择对应的字幕段落
+    video_files = video_files[:len(selected_subtitles)]
 
     # Generate TTS audio files and get their durations
-    audio_files, durations = generate_audio_for_subtitles(selected_subtitles)
+    audio_files, durations = generate_audio_for_subtitles(selected_subtitles[:len(video_files)])
+    return video_files, [text for _, _, text in selected_subtitles[:len(video_files)]], audio_files, durations
+
+def build_tts_timeline(video_files, texts, audio_files, durations, font_path, fps=24, crop_bottom=50):
+    """Builds the video-only timeline of the segments, each retimed to its TTS line and subtitled.
+
+    Returns (final_clip, placements, video_pool): placements lists (video file, TTS
+    file, start, duration) per clip on the timeline, and video_pool must be closed
+    once the clip is rendered. final_clip is None if no segment could be used.
+    """
+    clips = []
+
+    # 一次性渲染所有字幕图层
+    atlas = SubtitleAtlas(font_path, fontsize=28, color='white')
+    atlas.render_all(texts)
     
+    # 读取器在时间线走到对应片段时才打开，用完即关闭
+    open_clip, video_pool = lazy_video_opener(video_files, fps, audio=False)
+
+    placements = []  # (视频文件, 配音文件, 起始时间, 时长)
     current_time = 0  # 用于记录每个片段在合成视频中的起始时间
     for idx, file in enumerate(video_files):
         try:
-            clip = VideoFileClip(file).set_fps(fps)  # 设置帧率
-            original_size = clip.size  # 获取原始尺寸
-            
-            clip = crop_video(clip, crop_bottom=crop_bottom)  # 裁剪视频
-            clip = clip.resize(original_size)  # 拉伸回原始尺寸
-            
-            # 获取音频文件和对应的时长
-            audio_file = audio_files[idx]
-            audio_duration = durations[idx]
-            
-            # 调整视频片段的时长以匹配音频时长
-            clip = clip.set_duration(audio_duration)
-            
-            # 加载对应的音频文件并设置为视频片段的音频
-            audio = AudioFileClip(audio_file).subclip(0, audio_duration)
-            clip = clip.set_audio(audio)
-
-            # 获取对应的字幕段落
-            _, _, text = selected_subtitles[idx]
-
-            # 创建字幕文本的时间段，指定支持中文的字体
-            txt_clip = (TextClip(text, fontsize=28, color='white', font=font_path)
-                        .set_position(('center', 'bottom'))
-                        .set_start(0)
-                        .set_duration(audio_duration))
-            
-            # 将字幕与视频片段合成
-            clip_with_subtitle = CompositeVideoClip([clip, txt_clip]).set_start(current_time)
-            clips.append(clip_with_subtitle)
+            clip_with_subtitle = build_segment_clip(open_clip(idx), durations[idx], texts[idx], font_path,
+                                                    crop_bottom=crop_bottom, atlas=atlas)
+            clips.append(clip_with_subtitle.set_start(current_time))
+            placements.append((file, audio_files[idx], current_time, durations[idx]))
 
             # 更新当前时间
-            current_time += audio_duration
+            current_time += durations[idx]
         except Exception as e:
             print(f"Error processing file {file}: {e}")
             continue
-    
+
     if not clips:
-        print("No valid video clips found.")
-        return
+        return None, placements, video_pool
 
     # 合并所有视频片段
-    final_clip = concatenate_videoclips(clips, method="compose")
+    return concatenate_videoclips(clips, method="compose"), placements, video_pool
+
+def _tts_chunk_for_encode(video_files, texts, durations, probes, font_path, fps, crop_bottom, start, end):
+    """Builds only the [start, end) seconds of the TTS timeline, in the (clip, resources) form parallel_encode expects."""
+    offsets = [sum(durations[:idx]) for idx in range(len(durations))]
+    overlapping = [idx for idx in range(len(video_files)) if offsets[idx] < end and offsets[idx] + durations[idx] > start]
+
+    atlas = SubtitleAtlas(font_path, fontsize=28, color='white')
+    source_clips, video_pool = lazy_video_clips([video_files[idx] for idx in overlapping], fps, audio=False,
+                                                probes=[probes[idx] for idx in overlapping])
+    clips = [build_segment_clip(clip, durations[idx], texts[idx], font_path, crop_bottom=crop_bottom, atlas=atlas)
+             for clip, idx in zip(source_clips, overlapping)]
+    first = offsets[overlapping[0]]
+    return concatenate_videoclips(clips, method="compose").subclip(start - first, end - first), [video_pool]
+
+def create_final_video_with_tts(video_files, output_file, srt_file, font_path, fps=24, crop_bottom=50,
+                                original_gain=None, chunk_seconds=None, max_workers=None):
+    """Renders the selected segments retimed to their TTS lines, then adds the dub track in one streaming pass.
 
-    # 导出最终视频，恢复原始视频的高质量设置
+    MoviePy only renders the video. The TTS lines are decoded once each into a
+    memory-mapped DubTrack at their offsets and muxed with the video stream-copied.
+    With original_gain set, each segment's own audio is kept underneath at that gain.
+    With chunk_seconds set, the video is encoded in GOP-aligned chunks on max_workers
+    processes (see parallel_encode) instead of by a single write_videofile; the TTS
+    lines and probes are computed here once and each worker builds only its chunk.
+    """
+    video_files, texts, audio_files, durations = plan_tts_timeline(video_files, srt_file)
+    final_clip = video_pool = None
+    if chunk_seconds:
+        # 与逐段构建时一样，读不了的片段直接跳过，不让一个坏文件中断整个任务
+        kept, probes = [], []
+        for idx, file in enumerate(video_files):
+            try:
+                probes.append(probe_video(file))
+                kept.append(idx)
+            except Exception as e:
+                print(f"Error processing file {file}: {e}")
+        video_files, texts, audio_files, durations = ([values[idx] for idx in kept]
+                                                      for values in (video_files, texts, audio_files, durations))
+        placements = []
+        current_time = 0
+        for file, audio_file, duration in zip(video_files, audio_files, durations):
+            placements.append((file, audio_file, current_time, duration))
+            current_time += duration
+    else:
+        final_clip, placements, video_pool = build_tts_timeline(video_files, texts, audio_files, durations, font_path,
+                                                                fps=fps, crop_bottom=crop_bottom)
+    if not placements:
+        print("No valid video clips found.")
+        if video_pool is not None:
+            video_pool.close()
+        return
+
+    # 先只导出画面，再把配音轨一次性混入（视频流直接复制）
+    video_only_file = f"{output_file}.video.mp4"
+    track = None
     try:
-        final_clip.write_videofile(output_file, codec='libx264', audio_codec='aac', audio_bitrate='192k', bitrate='2000k', fps=fps, threads=4)
+        if chunk_seconds:
+            # 每个工作进程只构建与自己分块重叠的片段
+            encode_parallel(_tts_chunk_for_encode,
+                            (video_files, texts, durations, probes, font_path, fps, crop_bottom),
+                            video_only_file, sum(durations), fps, chunk_seconds=chunk_seconds,
+                            max_workers=max_workers, bitrate='2000k')
+        else:
+            final_clip.write_videofile(video_only_file, codec='libx264', audio=False, bitrate='2000k', fps=fps, threads=4)
+        track = DubTrack(sum(duration for _, _, _, duration in placements))
+        track.add_files([audio_file for _, audio_file, _, _ in placements],
+                        [offset for _, _, offset, _ in placements])
+        if original_gain is not None:
+            for file, _, offset, duration in placements:
+                track.add_background(file, offset=offset, duration=duration, gain=original_gain)
+        track.mux(video_only_file, output_file, audio_bitrate='192k')
         print(f"Final video created: {output_file}")
         
     except Exception as e:
         print(f"Error writing final video: {e}")
+    finally:
+        if final_clip is not None:
+            final_clip.close()
+            video_pool.close()
+        if track is not None:
+            track.close()
+        if os.path.exists(video_only_file):
+            os.remove(video_only_file)
+
+def create_final_video_incremental(video_files, output_file, srt_file, font_path, fps=24, crop_bottom=50,
+                                   work_dir='rendered_segments', manifest_path=None, threads=4, lang='en', tts=None):
+    """Renders each segment (video file i with cue i) to work_dir and joins them without re-encoding.
+
+    A segment is only re-rendered when its source segment, cue text, TTS clip or
+    render settings changed since the last run, so fixing one subtitle line re-renders
+    one segment and a stream-copy concat. threads is the x264 thread count per segment.
+    tts is (audio_files, durations) for the cues from an earlier TTS run; without it
+    the lines are synthesized in lang (through the cache).
+    """
+    subtitles = parse_srt_for_subtitles(srt_file)
+    if len(subtitles) < len(video_files):
+        raise ValueError("The subtitle file does not have enough entries to match the video segments.")
+    subtitles = subtitles[:len(video_files)]
+
+    if tts is not None:
+        audio_files, durations = (list(values)[:len(video_files)] for values in tts)
+    else:
+        audio_files, durations = generate_audio_for_subtitles(subtitles, lang=lang)
+    atlas = SubtitleAtlas(font_path, fontsize=28, color='white')
+
+    os.makedirs(work_dir, exist_ok=True)
+    manifest = BuildManifest(manifest_path or os.path.join(work_dir, 'manifest.json'))
+    settings = {'fps': fps, 'crop_bottom': crop_bottom, 'scale': 'bilinear', 'font': font_path, 'fontsize': 28,
+                'codec': 'libx264', 'audio_codec': 'aac', 'audio_bitrate': '192k', 'bitrate': '2000k'}
+
+    open_clip, video_pool = lazy_video_opener(video_files, fps, audio=False)
+    audio_clips, audio_pool = lazy_audio_clips(audio_files, durations)
+
+    rendered_files = []
+    rendered = 0
+    try:
+        for idx, file in enumerate(video_files):
+            _, _, text = subtitles[idx]
+            segment_file = os.path.join(work_dir, f"segment_{idx+1:03d}.mp4")
+            try:
+                fingerprint = segment_fingerprint(source=file_fingerprint(file), text=text,
+                                                  audio=os.path.basename(audio_files[idx]), settings=settings)
+                clip = None
+                if not manifest.is_fresh(segment_file, fingerprint):
+                    clip = build_segment_clip(open_clip(idx), durations[idx], text, font_path,
+                                              crop_bottom=crop_bottom, atlas=atlas, audio=audio_clips[idx])
+            except Exception as e:
+                print(f"Error processing file {file}: {e}")
+                continue
+            if clip is not None:
+                clip.write_videofile(segment_file, codec='libx264', audio_codec='aac', audio_bitrate='192k',
+                                     bitrate='2000k', fps=fps, threads=threads, logger=None)
+                manifest.record(segment_file, fingerprint)
+                manifest.save()
+                rendered += 1
+            rendered_files.append(segment_file)
+    finally:
+        video_pool.close()
+        audio_pool.close()
+
+    print(f"Rendered {rendered} of {len(video_files)} segments, joining")
+    ffmpeg_concat_copy(rendered_files, output_file)
+    print(f"Final video created: {output_file}")
+
+def create_dubbed_video_on_timeline(video_file, output_file, srt_file, lang='en', duck_gain=0.2, max_rate=1.5,
+                                    max_workers=None):
+    """Dubs video_file without retiming it: each TTS line is fitted into its cue window and the video is stream-copied.
+
+    Lines longer than their (start_time, end_time) window are sped up with WSOLA by at
+    most max_rate (then trimmed), on a process pool. The original audio stays
+    underneath, lowered to duck_gain inside the cue windows; duck_gain=None drops it.
+    """
+    subtitles = parse_srt_for_subtitles(srt_file)
+    audio_files, _ = generate_audio_for_subtitles(subtitles, lang=lang)
+    windows = [(start_time, end_time) for start_time, end_time, _ in subtitles]
+
+    track = DubTrack(probe_video(video_file)['duration'])
+    try:
+        stretched = trimmed = 0
+        fitted = fit_files(audio_files, [end_time - start_time for start_time, end_time in windows],
+                           track.sample_rate, track.channels, max_rate=max_rate, max_workers=max_workers)
+        for (start_time, _), (samples, rate, was_trimmed) in zip(windows, fitted):
+            track.add(samples, start_time)
+            stretched += rate > 1.0
+            trimmed += was_trimmed
+        print(f"Fitted {len(windows)} lines: {stretched} sped up, {trimmed} trimmed")
+
+        if duck_gain is not None:
+            track.add_background(video_file, duck_windows=windows, duck_gain=duck_gain)
+        track.mux(video_file, output_file, audio_bitrate='192k')
+        print(f"Final video created: {output_file}")
+    finally:
+        track.close()
 
-# 指定视频片段的目录和字幕文件路径
-video_directory = 'video_segments'
-output_video_file = 'final_high_quality_video_with_tts.mp4'
-srt_file_path = 'translated_subtitle_full.srt'
-font_path = '/System/Library/Fonts/PingFang.ttc'  # macOS 中 PingFang SC 字体的路径
+if __name__ == '__main__':
+    # 指定视频片段的目录和字幕文件路径
+    video_directory = 'video_segments'
+    output_video_file = 'final_high_quality_video_with_tts.mp4'
+    srt_file_path = 'translated_subtitle_full.srt'
+    font_path = '/System/Library/Fonts/PingFang.ttc'  # macOS 中 PingFang SC 字体的路径
 
-# 获取所有视频文件的列表并按自然顺序排序
-all_video_files = sorted([os.path.join(video_directory, file) for file in os.listdir(video_directory) if file.endswith('.mp4')])
+    # 获取所有视频文件的列表并按自然顺序排序
+    all_video_files = sorted([os.path.join(video_directory, file) for file in os.listdir(video_directory) if file.endswith('.mp4')])
 
-# 只选择1, 11, 21, 31 四个片段
-selected_video_files = [all_video_files[i] for i in [0, 10, 20, 30]]
+    # 只选择1, 11, 21, 31 四个片段
+    selected_video_files = [all_video_files[i] for i in [0, 10, 20, 30]]
 
-# 创建带有字幕的最终视频
-create_final_video_with_tts(selected_video_files, output_video_file, srt_file_path, font_path, crop_bottom=60)
+    # 创建带有字幕的最终视频
+    create_final_video_with_tts(selected_video_files, output_video_file, srt_file_path, font_path, crop_bottom=60)
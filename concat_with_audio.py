@@ -1,42 +1,20 @@
-from moviepy.editor import VideoFileClip, concatenate_videoclips, CompositeVideoClip, AudioFileClip, TextClip
-from gtts import gTTS
+from moviepy.editor import concatenate_videoclips
 import os
-import re
+
+from clip_pool import lazy_audio_clips, lazy_video_opener
+from srtlib import iter_srt
+from subtitle_atlas import SubtitleAtlas, overlay_subtitle
+from tts_cache import RateLimiter, TTSCache, synthesize_lines
 
 def parse_srt_for_subtitles(srt_file):
     """Parses the SRT file and returns a list of tuples (start_time, end_time, text)."""
-    with open(srt_file, 'r', encoding="utf-8") as file:
-        content = file.read()
-    
-    pattern = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-    matches = pattern.findall(content)
-
-    subtitles = []
-    for match in matches:
-        start_time = hms_to_seconds(match[0].replace(',', '.'))
-        end_time = hms_to_seconds(match[1].replace(',', '.'))
-        text = match[2].replace('\n', ' ').strip()
-        subtitles.append((start_time, end_time, text))
-    
-    return subtitles
-
-def hms_to_seconds(hms):
-    """Converts a time string HH:MM:SS,ms to seconds."""
-    h, m, s = hms.split(':')
-    s, ms = s.split('.')
-    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-
-def generate_audio_for_subtitles(subtitles, lang='en'):
-    """Generates audio files for each subtitle using Google TTS."""
-    audio_files = []
-    durations = []
-    for i, (_, _, text) in enumerate(subtitles):
-        tts = gTTS(text=text, lang=lang)
-        audio_file = f"audio_{i}.mp3"
-        tts.save(audio_file)
-        audio_clip = AudioFileClip(audio_file)
-        audio_files.append(audio_file)
-        durations.append(audio_clip.duration)
+    return [(cue.start, cue.end, cue.text.replace('\n', ' ')) for cue in iter_srt(srt_file)]
+
+def generate_audio_for_subtitles(subtitles, lang='en', cache=None, max_workers=8, requests_per_second=5):
+    """Generates audio files for each subtitle using Google TTS, reusing cached lines from earlier runs."""
+    cache = cache or TTSCache('tts_cache', rate_limiter=RateLimiter(requests_per_second, burst=max_workers))
+    audio_files, durations = synthesize_lines(cache, [text for _, _, text in subtitles], lang, max_workers=max_workers)
+    print(f"TTS cache: {cache.hits} hits, {cache.misses} synthesized")
     return audio_files, durations
 
 def crop_video(video, crop_bottom=50):
@@ -58,35 +36,34 @@ def create_final_video_with_tts(video_files, output_file, srt_file, font_path, f
 
     # Generate TTS audio files and get their durations
     audio_files, durations = generate_audio_for_subtitles(selected_subtitles)
+
+    # 一次性渲染所有字幕图层，指定支持中文的字体
+    atlas = SubtitleAtlas(font_path, fontsize=28, color='white')
+    atlas.render_all([text for _, _, text in selected_subtitles])
     
+    # 读取器在时间线走到对应片段时才打开，用完即关闭
+    open_clip, video_pool = lazy_video_opener(video_files, fps, audio=False)
+    audio_clips, audio_pool = lazy_audio_clips(audio_files, durations)
+
     current_time = 0  # 用于记录每个片段在合成视频中的起始时间
     for idx, file in enumerate(video_files):
         try:
-            clip = VideoFileClip(file).set_fps(fps)  # 设置帧率
-            clip = crop_video(clip, crop_bottom=crop_bottom)  # 裁剪视频
+            clip = crop_video(open_clip(idx), crop_bottom=crop_bottom)  # 裁剪视频（读不了的片段在这里跳过）
             
-            # 获取音频文件和对应的时长
-            audio_file = audio_files[idx]
+            # 获取对应的时长
             audio_duration = durations[idx]
             
             # 调整视频片段的时长以匹配音频时长
             clip = clip.set_duration(audio_duration)
             
             # 加载对应的音频文件并设置为视频片段的音频
-            audio = AudioFileClip(audio_file).subclip(0, audio_duration)
-            clip = clip.set_audio(audio)
+            clip = clip.set_audio(audio_clips[idx])
 
             # 获取对应的字幕段落
             _, _, text = selected_subtitles[idx]
 
-            # 创建字幕文本的时间段，指定支持中文的字体
-            txt_clip = (TextClip(text, fontsize=28, color='white', font=font_path)
-                        .set_position(('center', 'bottom'))
-                        .set_start(0)
-                        .set_duration(audio_duration))
-            
-            # 将字幕与视频片段合成
-            clip_with_subtitle = CompositeVideoClip([clip, txt_clip]).set_start(current_time)
+            # 将字幕贴到视频片段底部（只混合字幕所在区域）
+            clip_with_subtitle = overlay_subtitle(clip, atlas.sprite(text)).set_start(current_time)
             clips.append(clip_with_subtitle)
 
             # 更新当前时间
@@ -97,6 +74,8 @@ def create_final_video_with_tts(video_files, output_file, srt_file, font_path, f
     
     if not clips:
         print("No valid video clips found.")
+        video_pool.close()
+        audio_pool.close()
         return
 
     # 合并所有视频片段
@@ -109,6 +88,10 @@ def create_final_video_with_tts(video_files, output_file, srt_file, font_path, f
         
     except Exception as e:
         print(f"Error writing final video: {e}")
+    finally:
+        final_clip.close()
+        video_pool.close()
+        audio_pool.close()
 
 # 指定视频片段的目录和字幕文件路径
 video_directory = 'video_segments'
@@ -0,0 +1,152 @@
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_io import iter_pcm
+
+def decode_float32(audio_file_path, sample_rate=44100, channels=2):
+    """Decodes a whole (short) audio file once with ffmpeg into a float32 array of shape (samples, channels)."""
+    pcm = b''.join(iter_pcm(audio_file_path, sample_rate=sample_rate, channels=channels))
+    return np.frombuffer(pcm, dtype='<i2').reshape(-1, channels).astype(np.float32) / 32768.0
+
+def iter_float32(audio_file_path, sample_rate=44100, channels=2, chunk_frames=1 << 16):
+    """Streams a (long) audio track as float32 blocks of shape (<= chunk_frames, channels)."""
+    frame_bytes = 2 * channels
+    pending = b''
+    for chunk in iter_pcm(audio_file_path, sample_rate=sample_rate, channels=channels,
+                          chunk_size=chunk_frames * frame_bytes):
+        pending += chunk
+        usable = len(pending) - len(pending) % frame_bytes
+        if usable:
+            yield np.frombuffer(pending[:usable], dtype='<i2').reshape(-1, channels).astype(np.float32) / 32768.0
+            pending = pending[usable:]
+
+def duck_envelope(windows, sample_rate, fade=0.05):
+    """Breakpoints (sample positions, weights) that are 1 inside the (start, end) second windows and 0 outside.
+
+    Windows closer than two fades are merged and each edge ramps linearly over fade
+    seconds, so np.interp over the breakpoints gives a click-free ducking curve.
+    """
+    fade_samples = fade * sample_rate
+    merged = []
+    for start, end in sorted(windows):
+        start, end = start * sample_rate, end * sample_rate
+        if merged and start - merged[-1][1] <= 2 * fade_samples:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    positions, weights = [], []
+    for start, end in merged:
+        positions += [start - fade_samples, start, end, end + fade_samples]
+        weights += [0.0, 1.0, 1.0, 0.0]
+    return np.array(positions), np.array(weights)
+
+class DubTrack:
+    """A dubbing audio timeline assembled in one float32 buffer.
+
+    The buffer is a memory-mapped temporary file, so a multi-hour episode costs disk
+    space rather than RAM. TTS clips are decoded once each and added at their offsets,
+    the original track can be mixed in underneath with ducking, and the result is
+    streamed straight into ffmpeg in a single pass.
+    """
+
+    def __init__(self, duration, sample_rate=44100, channels=2, work_dir=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._file = tempfile.NamedTemporaryFile(suffix='.f32', dir=work_dir, delete=False)
+        self._file.close()
+        n_samples = max(1, int(round(duration * sample_rate)))
+        self.samples = np.memmap(self._file.name, dtype=np.float32, mode='w+', shape=(n_samples, channels))
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def add(self, samples, offset, gain=1.0):
+        """Mixes (samples, channels) float32 audio into the track starting at offset seconds; the excess is dropped."""
+        start = int(round(offset * self.sample_rate))
+        if start >= len(self.samples) or not len(samples):
+            return
+        samples = samples[max(0, -start):len(self.samples) - start]
+        start = max(0, start)
+        self.samples[start:start + len(samples)] += samples * gain if gain != 1.0 else samples
+
+    def add_files(self, audio_files, offsets, max_workers=8):
+        """Decodes audio_files concurrently (one ffmpeg each) and adds each at its offset in seconds."""
+        decode = lambda path: decode_float32(path, self.sample_rate, self.channels)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for samples, offset in zip(executor.map(decode, audio_files), offsets):
+                self.add(samples, offset)
+
+    def add_background(self, audio_file_path, offset=0.0, duration=None, duck_windows=(), gain=1.0, duck_gain=0.25,
+                       fade=0.05):
+        """Streams another track (e.g. the original audio) under the dub from offset seconds on.
+
+        At most duration seconds are mixed. Inside duck_windows (seconds on the track's
+        timeline) the gain drops to duck_gain, with fade-second linear ramps.
+        """
+        positions, weights = duck_envelope(duck_windows, self.sample_rate, fade)
+        position = max(0, int(round(offset * self.sample_rate)))
+        end = len(self.samples)
+        if duration is not None:
+            end = min(end, position + int(round(duration * self.sample_rate)))
+        for block in iter_float32(audio_file_path, self.sample_rate, self.channels):
+            block = block[:end - position]
+            if not len(block):
+                break
+            if len(positions):
+                weight = np.interp(np.arange(position, position + len(block)), positions, weights, left=0.0, right=0.0)
+                envelope = (gain - (gain - duck_gain) * weight).astype(np.float32)[:, None]
+            else:
+                envelope = np.float32(gain)
+            self.samples[position:position + len(block)] += block * envelope
+            position += len(block)
+
+    def iter_blocks(self, block_frames=1 << 16):
+        """Yields the mixed track as clipped float32 little-endian bytes."""
+        for start in range(0, len(self.samples), block_frames):
+            yield np.clip(self.samples[start:start + block_frames], -1.0, 1.0).astype('<f4').tobytes()
+
+    def mux(self, video_file, output_file, audio_codec='aac', audio_bitrate='192k'):
+        """Writes output_file with video_file's video stream copied and this track encoded as its audio."""
+        cmd = [
+            'ffmpeg',
+            '-y',  # Overwrite output file if it exists
+            '-v', 'error',
+            '-i', video_file,  # Video input
+            '-f', 'f32le',  # Raw float32 PCM on stdin
+            '-ar', str(self.sample_rate),
+            '-ac', str(self.channels),
+            '-i', '-',
+            '-map', '0:v:0', '-map', '1:a:0',
+            '-c:v', 'copy',  # Stream copy video, no re-encoding
+            '-c:a', audio_codec,
+            '-b:a', audio_bitrate,
+            '-shortest',
+            output_file
+        ]
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            for block in self.iter_blocks():
+                process.stdin.write(block)
+        except BrokenPipeError:
+            pass  # ffmpeg 提前退出，错误信息见下方 stderr
+        finally:
+            process.stdin.close()
+        stderr = process.stderr.read()
+        process.stdout.close()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+
+    def close(self):
+        """Releases the buffer and deletes its backing file."""
+        mmap = getattr(self.samples, '_mmap', None)
+        self.samples = None
+        if mmap is not None:
+            mmap.close()
+        if os.path.exists(self._file.name):
+            os.remove(self._file.name)
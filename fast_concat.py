@@ -0,0 +1,114 @@
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageFont
+
+from smart_cut import write_concat_list
+from srtlib import Cue, write_srt
+from timestamps import seconds_to_ms
+
+ASS_PLAY_RES_Y = 288  # libass scales FontSize against this script height by default
+
+def probe_video(video_file):
+    """Returns duration (seconds), width and height of a video file from its headers."""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height:format=duration',
+        '-of', 'json',
+        video_file
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    info = json.loads(result.stdout)
+    stream = info['streams'][0]
+    return {
+        'duration': float(info['format']['duration']),
+        'width': int(stream['width']),
+        'height': int(stream['height']),
+    }
+
+def probe_all(video_files, max_workers=8):
+    """Probes many segments concurrently, keeping their order."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(probe_video, video_files))
+
+def build_timeline_srt(video_files, texts, output_srt, probes=None):
+    """Writes an SRT whose cue i spans segment i on the concatenated timeline."""
+    probes = probes or probe_all(video_files)
+    cues = []
+    current_ms = 0
+    for i, (probe, text) in enumerate(zip(probes, texts)):
+        duration_ms = seconds_to_ms(probe['duration'])
+        if text:
+            cues.append(Cue(i + 1, current_ms, current_ms + duration_ms, text))
+        current_ms += duration_ms
+    write_srt(cues, output_srt)
+    return output_srt
+
+def _escape_filter_path(path):
+    """Escapes a path for use inside an ffmpeg filter argument."""
+    return path.replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+
+def font_family_name(font_path):
+    """Family name libass needs in FontName to pick the font file at font_path."""
+    return ImageFont.truetype(font_path).getname()[0]
+
+def fast_concat(video_files, output_file, texts=None, subtitle_mode='burn', font_path=None, font_name=None,
+                fontsize=28, crop_bottom=0, fps=None, bitrate='500k', audio_bitrate='128k'):
+    """Joins segments that share codec parameters with the ffmpeg concat demuxer, without MoviePy.
+
+    texts[i] is the subtitle shown over video_files[i]. subtitle_mode is 'burn' (one
+    ffmpeg pass: optional crop, subtitles filter, x264), 'soft' (a mov_text track, every
+    stream copied) or None (plain stream copy). fontsize is in pixels of the output
+    height, like TextClip's; font_path's directory is handed to libass as fontsdir and
+    its family name (unless font_name is given) as FontName. fps sets the burned output's
+    frame rate.
+    """
+    list_file = f"{output_file}.txt"
+    srt_file = f"{output_file}.srt"
+    write_concat_list(video_files, list_file)
+    cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_file]
+    try:
+        if texts is None or subtitle_mode is None:
+            cmd += ['-c', 'copy', output_file]  # Stream copy, no re-encoding
+        else:
+            probes = probe_all(video_files)
+            build_timeline_srt(video_files, texts, srt_file, probes)
+            if subtitle_mode == 'soft':
+                cmd += [
+                    '-i', srt_file,
+                    '-map', '0:v', '-map', '0:a?', '-map', '1:s',
+                    '-c', 'copy',  # Stream copy audio and video
+                    '-c:s', 'mov_text',  # MP4 subtitle track
+                    output_file
+                ]
+            elif subtitle_mode == 'burn':
+                height = probes[0]['height'] - crop_bottom
+                style = f"FontSize={round(fontsize * ASS_PLAY_RES_Y / height)},PrimaryColour=&H00FFFFFF,Alignment=2"
+                font_name = font_name or (font_family_name(font_path) if font_path else None)
+                if font_name:
+                    style = f"FontName={font_name}," + style
+                subtitles_filter = f"subtitles='{_escape_filter_path(srt_file)}'"
+                if font_path:
+                    subtitles_filter += f":fontsdir='{_escape_filter_path(os.path.dirname(font_path))}'"
+                subtitles_filter += f":force_style='{style}'"
+                filters = ([f"crop=iw:ih-{crop_bottom}:0:0"] if crop_bottom else []) + [subtitles_filter]
+                cmd += [
+                    '-vf', ','.join(filters),  # Crop and burn in subtitles in the same pass
+                    *(['-r', str(fps)] if fps else []),  # Output frame rate
+                    '-c:v', 'libx264',
+                    '-b:v', bitrate,
+                    '-c:a', 'aac',
+                    '-b:a', audio_bitrate,
+                    output_file
+                ]
+            else:
+                raise ValueError(f"Unknown subtitle_mode {subtitle_mode!r}")
+        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    finally:
+        for file in (list_file, srt_file):
+            if os.path.exists(file):
+                os.remove(file)
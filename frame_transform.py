@@ -0,0 +1,56 @@
+import numpy as np
+
+def _axis_map(in_len, out_len):
+    """Source indices and 8-bit weights for bilinear resampling of one axis (pixel centers aligned)."""
+    position = (np.arange(out_len) + 0.5) * in_len / out_len - 0.5
+    position = np.clip(position, 0, in_len - 1)
+    low = np.floor(position).astype(np.intp)
+    high = np.minimum(low + 1, in_len - 1)
+    weight = np.round((position - low) * 256).astype(np.uint16)
+    return low, high, weight
+
+def _resample_axis(frame, low, high, weight, axis):
+    # 定点插值：(a * (256 - w) + b * w + 128) >> 8，uint16 不会溢出
+    weight = weight.reshape((-1,) + (1,) * (frame.ndim - axis - 1))
+    a = np.take(frame, low, axis=axis).astype(np.uint16)
+    b = np.take(frame, high, axis=axis)
+    a *= 256 - weight
+    a += b * weight
+    a += 128
+    a >>= 8
+    return a.astype(np.uint8)
+
+class CropScale:
+    """Crops a frame to box = (x1, y1, x2, y2) and bilinearly scales it to size = (width, height).
+
+    The index maps and weights are computed once per geometry, so each frame costs a
+    couple of NumPy gathers and integer multiply-adds. An axis whose length does not
+    change is only sliced, so removing bottom rows and stretching back to the original
+    height (crop_video followed by resize) resamples rows only.
+    """
+
+    def __init__(self, frame_size, box, size):
+        x1, y1, x2, y2 = box
+        if not (0 <= x1 < x2 <= frame_size[0] and 0 <= y1 < y2 <= frame_size[1]):
+            raise ValueError(f"Crop box {box} does not fit a {frame_size[0]}x{frame_size[1]} frame")
+        self.box = box
+        self.size = size
+        width, height = size
+        self._rows = _axis_map(y2 - y1, height) if y2 - y1 != height else None
+        self._columns = _axis_map(x2 - x1, width) if x2 - x1 != width else None
+
+    def __call__(self, frame):
+        x1, y1, x2, y2 = self.box
+        frame = frame[y1:y2, x1:x2]
+        if self._rows is not None:
+            frame = _resample_axis(frame, *self._rows, axis=0)
+        if self._columns is not None:
+            frame = _resample_axis(frame, *self._columns, axis=1)
+        return frame
+
+def crop_scale_clip(clip, box, size):
+    """Returns clip cropped to box and scaled to size in one vectorized per-frame step."""
+    transform = CropScale(clip.size, box, size)
+    new_clip = clip.fl_image(transform)
+    new_clip.size = tuple(size)
+    return new_clip
@@ -0,0 +1,79 @@
+import math
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from smart_cut import ffmpeg_concat_copy
+
+def plan_chunks(duration, fps, chunk_seconds=60, gop_frames=48):
+    """Splits [0, duration) into (first_frame, end_frame) ranges whose boundaries are multiples of gop_frames.
+
+    Every chunk except the last is a whole number of GOPs of about chunk_seconds, so the
+    chunks' keyframes land where a single encode with the same -g would put them.
+    """
+    total_frames = math.ceil(round(duration * fps, 6))
+    frames_per_chunk = max(1, round(chunk_seconds * fps / gop_frames)) * gop_frames
+    return [(first, min(first + frames_per_chunk, total_frames)) for first in range(0, total_frames, frames_per_chunk)]
+
+def _encode_chunk(job):
+    builder, builder_args, first_frame, end_frame, chunk_file, fps, codec, bitrate, gop_frames, threads = job
+    # 结束时间取半帧之前，MoviePy 的 arange 正好产出 end_frame - first_frame 帧
+    clip, resources = builder(*builder_args, first_frame / fps, (end_frame - 0.5) / fps)
+    try:
+        clip.write_videofile(chunk_file, codec=codec, bitrate=bitrate, fps=fps, audio=False, threads=threads,
+                             ffmpeg_params=['-g', str(gop_frames), '-keyint_min', str(gop_frames)], logger=None)
+    finally:
+        clip.close()
+        for resource in resources:
+            resource.close()
+    return chunk_file
+
+def encode_parallel(builder, builder_args, output_file, duration, fps, chunk_seconds=60, gop_seconds=2,
+                    max_workers=None, codec='libx264', bitrate='2000k', audio_file=None, work_dir=None):
+    """Encodes a MoviePy timeline of duration seconds in GOP-aligned chunks on a process pool.
+
+    builder(*builder_args, start, end) must be a picklable (module-level) function
+    returning (clip, resources), where clip is the timeline's [start, end) seconds
+    starting at time 0: each worker builds only its own chunk, renders it, then closes
+    the clip and every resource. The chunks are joined without re-encoding, and
+    audio_file, if given, is muxed in during the stream-copy concat.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // max_workers)
+    gop_frames = max(1, round(gop_seconds * fps))
+    work_dir = work_dir or f"{output_file}.chunks"
+    os.makedirs(work_dir, exist_ok=True)
+    chunks = plan_chunks(duration, fps, chunk_seconds, gop_frames)
+
+    _, ext = os.path.splitext(output_file)
+    jobs = [(builder, builder_args, first_frame, end_frame, os.path.join(work_dir, f"chunk_{i:04d}{ext}"),
+             fps, codec, bitrate, gop_frames, threads)
+            for i, (first_frame, end_frame) in enumerate(chunks)]
+    print(f"Encoding {len(jobs)} chunks on {max_workers} workers ({threads} x264 threads each)")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunk_files = list(executor.map(_encode_chunk, jobs))
+
+    try:
+        if audio_file is None:
+            ffmpeg_concat_copy(chunk_files, output_file)
+        else:
+            video_file = os.path.join(work_dir, f"video{ext}")
+            ffmpeg_concat_copy(chunk_files, video_file)
+            cmd = [
+                'ffmpeg',
+                '-y',  # Overwrite output file if it exists
+                '-i', video_file,  # Joined video
+                '-i', audio_file,  # Audio rendered beforehand
+                '-map', '0:v:0', '-map', '1:a:0',
+                '-c', 'copy',  # Stream copy, no re-encoding
+                output_file
+            ]
+            subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            os.remove(video_file)
+    finally:
+        for file in chunk_files:
+            if os.path.exists(file):
+                os.remove(file)
+        if not os.listdir(work_dir):
+            os.rmdir(work_dir)
+    return output_file
@@ -0,0 +1,316 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from build_manifest import BuildManifest, file_fingerprint
+from srtlib import iter_srt
+
+FILE = 'file'
+DIRECTORY = 'dir'
+
+class Artifact:
+    """A typed intermediate of an episode: a file or directory at work_dir/<episode>/<filename>."""
+    __slots__ = ('name', 'kind', 'filename')
+
+    def __init__(self, name, kind, filename):
+        self.name = name
+        self.kind = kind
+        self.filename = filename
+
+    def __repr__(self):
+        return f"Artifact({self.name!r}, {self.kind!r}, {self.filename!r})"
+
+class Stage:
+    """One step of the pipeline.
+
+    func is called with keyword arguments: one path per input and output (keyed by the
+    parameter names in inputs/outputs, which map to artifact names) plus params.
+    resource ('cpu' or 'io') says what the stage mostly waits on; bump version when
+    func's behaviour changes so cached outputs are rebuilt. A stage with cores > 1 can
+    use that many cores, and func also gets a cores keyword with how many it may use
+    this run (left out of the cache key, so changing concurrency does not rebuild).
+    """
+
+    def __init__(self, name, func, inputs, outputs, params=None, resource='cpu', version=1, cores=1):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.resource = resource
+        self.version = version
+        self.cores = cores
+
+def artifact_hash(path, kind):
+    """Content hash of a file (sampled, see file_fingerprint) or of every file under a directory."""
+    if kind == FILE:
+        return file_fingerprint(path)
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for file in sorted(files):
+            if file == 'manifest.json':
+                continue  # 片段清单只是缓存记录，不属于内容
+            file_path = os.path.join(root, file)
+            digest.update(f"{os.path.relpath(file_path, path)}:{file_fingerprint(file_path)}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+class Pipeline:
+    """A DAG of stages over named artifacts.
+
+    Artifacts that no stage produces are sources, supplied per episode. Every stage
+    output is recorded in the episode's manifest under a key hashing the stage name,
+    version, params and the content of its inputs, so a stage is skipped when its
+    outputs exist and nothing it depends on changed.
+    """
+
+    def __init__(self, artifacts, stages):
+        self.artifacts = {artifact.name: artifact for artifact in artifacts}
+        self.stages = {stage.name: stage for stage in stages}
+        self.producers = {}
+        for stage in stages:
+            for name in list(stage.inputs.values()) + list(stage.outputs.values()):
+                if name not in self.artifacts:
+                    raise ValueError(f"Stage {stage.name} uses unknown artifact {name}")
+            for name in stage.outputs.values():
+                if name in self.producers:
+                    raise ValueError(f"Artifact {name} is produced by both {self.producers[name]} and {stage.name}")
+                self.producers[name] = stage.name
+        self.sources = [name for name in self.artifacts if name not in self.producers]
+        self.order = self._topological_order()
+
+    def dependencies(self, stage_name):
+        """Names of the stages whose outputs stage_name reads."""
+        return {self.producers[name] for name in self.stages[stage_name].inputs.values() if name in self.producers}
+
+    def _topological_order(self):
+        order = []
+        state = {}
+        def visit(name):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle in pipeline at stage {name}")
+            state[name] = 'visiting'
+            for dependency in sorted(self.dependencies(name)):
+                visit(dependency)
+            state[name] = 'done'
+            order.append(name)
+        for name in self.stages:
+            visit(name)
+        return order
+
+class EpisodeRun:
+    """Paths, cache manifest and per-stage status of one episode going through a pipeline."""
+
+    def __init__(self, pipeline, name, sources, work_dir):
+        missing = set(pipeline.sources) - set(sources)
+        if missing:
+            raise ValueError(f"Episode {name} is missing sources: {', '.join(sorted(missing))}")
+        self.pipeline = pipeline
+        self.name = name
+        self.directory = os.path.join(work_dir, name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.paths = dict(sources)
+        for artifact in pipeline.artifacts.values():
+            if artifact.name not in sources:
+                self.paths[artifact.name] = os.path.join(self.directory, artifact.filename)
+        self.manifest = BuildManifest(os.path.join(self.directory, 'pipeline.json'))
+        self.status = {}  # stage -> 'done' | 'skipped' | 'failed' | 'blocked'
+        self._lock = threading.Lock()
+
+    def stage_key(self, stage):
+        parts = {
+            'stage': stage.name,
+            'version': stage.version,
+            'params': stage.params,
+            'inputs': {param: artifact_hash(self.paths[name], self.pipeline.artifacts[name].kind)
+                       for param, name in sorted(stage.inputs.items())},
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, stage, key):
+        return all(self.manifest.is_fresh(self.paths[name], key) for name in stage.outputs.values())
+
+    def run_stage(self, stage_name, cores=None):
+        """Runs one stage unless its outputs are up to date, on at most cores cores. Returns 'done' or 'skipped'."""
+        stage = self.pipeline.stages[stage_name]
+        key = self.stage_key(stage)
+        if self.is_fresh(stage, key):
+            return 'skipped'
+        kwargs = {param: self.paths[name] for param, name in stage.inputs.items()}
+        kwargs.update({param: self.paths[name] for param, name in stage.outputs.items()})
+        kwargs.update(stage.params)
+        if stage.cores > 1:
+            kwargs['cores'] = min(stage.cores, cores or stage.cores)
+        stage.func(**kwargs)
+        with self._lock:
+            for name in stage.outputs.values():
+                if not os.path.exists(self.paths[name]):
+                    raise RuntimeError(f"Stage {stage_name} did not produce {self.paths[name]}")
+                self.manifest.record(self.paths[name], key)
+            self.manifest.save()
+        return 'done'
+
+def run_episodes(pipeline, episodes, work_dir='episodes', max_workers=4):
+    """Runs every episode through the pipeline on one shared pool of max_workers threads.
+
+    episodes maps episode name -> {source artifact: path}. Any stage whose
+    dependencies are finished is started, so independent stages of one episode and
+    stages of different episodes run side by side. A failed stage blocks only what
+    depends on it. Multi-core stages each get an equal share of the machine's cores,
+    so max_workers encodes together do not oversubscribe it. Returns {episode: {stage: status}}.
+    """
+    cores = max(1, (os.cpu_count() or 1) // max_workers)
+    runs = {name: EpisodeRun(pipeline, name, sources, work_dir) for name, sources in episodes.items()}
+    waiting = {(episode, stage) for episode in runs for stage in pipeline.order}
+    running = {}
+
+    def settle():
+        # 依赖失败的阶段直接标记为 blocked
+        changed = True
+        while changed:
+            changed = False
+            for episode, stage in sorted(waiting):
+                statuses = [runs[episode].status.get(dependency) for dependency in pipeline.dependencies(stage)]
+                if any(status in ('failed', 'blocked') for status in statuses):
+                    runs[episode].status[stage] = 'blocked'
+                    waiting.discard((episode, stage))
+                    changed = True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while waiting or running:
+            settle()
+            for episode, stage in sorted(waiting, key=lambda job: (pipeline.order.index(job[1]), job[0])):
+                if all(runs[episode].status.get(dependency) in ('done', 'skipped')
+                       for dependency in pipeline.dependencies(stage)):
+                    waiting.discard((episode, stage))
+                    running[executor.submit(runs[episode].run_stage, stage, cores)] = (episode, stage)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                episode, stage = running.pop(future)
+                try:
+                    runs[episode].status[stage] = future.result()
+                except Exception as e:
+                    runs[episode].status[stage] = 'failed'
+                    print(f"[{episode}] {stage} failed: {e}")
+                else:
+                    print(f"[{episode}] {stage} {runs[episode].status[stage]}")
+    return {name: run.status for name, run in runs.items()}
+
+# --- 各阶段：对现有脚本函数的薄封装，重依赖在函数内导入 ---
+
+def preprocess_stage(source_video, preprocessed_video):
+    from preprocess import preprocess_video_with_keyframes_and_fps
+    preprocess_video_with_keyframes_and_fps(source_video, preprocessed_video)
+
+def extract_audio_stage(source_video, audio):
+    cmd = [
+        'ffmpeg',
+        '-y',  # Overwrite output file if it exists
+        '-i', source_video,  # Input file
+        '-vn',  # Drop the video stream
+        '-ac', '1',  # Mono, as the recognizer expects
+        '-c:a', 'pcm_s16le',  # LINEAR16
+        audio
+    ]
+    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+def transcribe_stage(audio, subtitles, max_chars=40, max_duration=4.0):
+    from audio import create_srt_subtitles_from_words, transcribe_long_audio_file
+    create_srt_subtitles_from_words(transcribe_long_audio_file(audio), subtitles, max_chars, max_duration)
+
+def translate_stage(subtitles, translated_subtitles, target_language='en'):
+    from translate_to_en import parse_srt_for_subtitles, save_translated_srt, translate_subtitles
+    save_translated_srt(translate_subtitles(parse_srt_for_subtitles(subtitles), target_language), translated_subtitles)
+
+def split_stage(preprocessed_video, subtitles, segments, cores=1):
+    from split_by_srt_no_audio import cut_video_parallel
+    # 与 cut_video_parallel 的默认划分相同（每 4 核一个 ffmpeg），只是按分到的核数而不是整机计算
+    max_workers = max(1, cores // 4)
+    failures = cut_video_parallel(preprocessed_video, subtitles, segments, max_workers=max_workers,
+                                  threads_per_worker=max(1, cores // max_workers),
+                                  manifest_path=os.path.join(segments, 'manifest.json'))
+    if failures:
+        raise RuntimeError(f"{len(failures)} segments failed to encode")
+
+def tts_stage(translated_subtitles, tts_lines, lang='en'):
+    from concat_final import generate_audio_for_subtitles, parse_srt_for_subtitles
+    audio_files, durations = generate_audio_for_subtitles(parse_srt_for_subtitles(translated_subtitles), lang=lang)
+    with open(tts_lines, 'w', encoding='utf-8') as file:
+        json.dump([{'file': audio_file, 'duration': duration} for audio_file, duration in zip(audio_files, durations)],
+                  file, ensure_ascii=False, indent=1)
+
+def concat_stage(segments, translated_subtitles, tts_lines, final_video, font_path, crop_bottom=60, cores=1):
+    from concat_final import create_final_video_incremental
+    # 按字幕条数列出片段，与 split 的命名一致；目录里多余的旧文件不会混进来
+    cue_count = sum(1 for _ in iter_srt(translated_subtitles))
+    video_files = [os.path.join(segments, f"segment_{i+1:03d}.mp4") for i in range(cue_count)]
+    # 直接使用 tts 阶段生成的配音（目标语言），不再重新合成
+    with open(tts_lines, 'r', encoding='utf-8') as file:
+        lines = json.load(file)
+    tts = ([line['file'] for line in lines], [line['duration'] for line in lines])
+    create_final_video_incremental(video_files, final_video, translated_subtitles, font_path, crop_bottom=crop_bottom,
+                                   work_dir=f"{final_video}.segments", threads=cores, tts=tts)
+
+def episode_pipeline(font_path, target_language='en', crop_bottom=60, encode_cores=None):
+    """preprocess / extract audio -> transcribe -> translate -> split + TTS -> concat, as a DAG.
+
+    encode_cores caps the cores the split and concat stages use (default: all of them).
+    """
+    encode_cores = encode_cores or os.cpu_count() or 1
+    artifacts = [
+        Artifact('source_video', FILE, 'input_video.mp4'),
+        Artifact('preprocessed_video', FILE, 'preprocessed_video_standard.mp4'),
+        Artifact('audio', FILE, 'extracted_audio.wav'),
+        Artifact('subtitles', FILE, 'output_subtitle.srt'),
+        Artifact('translated_subtitles', FILE, f"translated_subtitle_full_{target_language}.srt"),
+        Artifact('segments', DIRECTORY, 'video_segments'),
+        Artifact('tts_lines', FILE, 'tts_lines.json'),
+        Artifact('final_video', FILE, 'final_video_with_tts.mp4'),
+    ]
+    stages = [
+        Stage('preprocess', preprocess_stage, {'source_video': 'source_video'},
+              {'preprocessed_video': 'preprocessed_video'}),
+        Stage('extract_audio', extract_audio_stage, {'source_video': 'source_video'}, {'audio': 'audio'}),
+        Stage('transcribe', transcribe_stage, {'audio': 'audio'}, {'subtitles': 'subtitles'}, resource='io'),
+        Stage('translate', translate_stage, {'subtitles': 'subtitles'},
+              {'translated_subtitles': 'translated_subtitles'}, params={'target_language': target_language},
+              resource='io'),
+        Stage('split', split_stage, {'preprocessed_video': 'preprocessed_video', 'subtitles': 'subtitles'},
+              {'segments': 'segments'}, cores=encode_cores),
+        Stage('tts', tts_stage, {'translated_subtitles': 'translated_subtitles'}, {'tts_lines': 'tts_lines'},
+              params={'lang': target_language}, resource='io'),
+        Stage('concat', concat_stage,
+              {'segments': 'segments', 'translated_subtitles': 'translated_subtitles', 'tts_lines': 'tts_lines'},
+              {'final_video': 'final_video'}, params={'font_path': font_path, 'crop_bottom': crop_bottom},
+              cores=encode_cores),
+    ]
+    return Pipeline(artifacts, stages)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run episodes through the dubbing pipeline, skipping up-to-date stages.")
+    parser.add_argument('videos', nargs='+', help="Source videos, one per episode")
+    parser.add_argument('--work-dir', default='episodes', help="Per-episode artifacts go to WORK_DIR/<episode>/")
+    parser.add_argument('--font', default='/System/Library/Fonts/PingFang.ttc', help="Subtitle font")
+    parser.add_argument('--lang', default='en', help="Target language")
+    parser.add_argument('-j', '--jobs', type=int, default=4, help="Stages running at once across all episodes")
+    args = parser.parse_args()
+
+    pipeline = episode_pipeline(args.font, target_language=args.lang)
+    episodes = {os.path.splitext(os.path.basename(video))[0]: {'source_video': os.path.abspath(video)}
+                for video in args.videos}
+    results = run_episodes(pipeline, episodes, work_dir=args.work_dir, max_workers=args.jobs)
+    failed = [name for name, status in results.items() if 'failed' in status.values()]
+    print(f"{len(results) - len(failed)} of {len(results)} episodes finished")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -20,8 +20,9 @@ def preprocess_video_with_keyframes_and_fps(input_file, output_file, target_fps=
     subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
     print(f"Preprocessed video saved to {output_file}")
 
-# Usage
-input_video_file = "input_video.mp4"  # Replace with your input video file path
-preprocessed_video_file = "preprocessed_video_standard.mp4"  # Replace with your desired output file path
+if __name__ == "__main__":
+    # Usage
+    input_video_file = "input_video.mp4"  # Replace with your input video file path
+    preprocessed_video_file = "preprocessed_video_standard.mp4"  # Replace with your desired output file path
 
-preprocess_video_with_keyframes_and_fps(input_video_file, preprocessed_video_file)
+    preprocess_video_with_keyframes_and_fps(input_video_file, preprocessed_video_file)
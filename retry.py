@@ -0,0 +1,17 @@
+import time
+
+def backoff_delay(attempt, backoff=1.0):
+    """Seconds to wait before retry number attempt + 1: backoff, 2 * backoff, 4 * backoff, ..."""
+    return backoff * (2 ** attempt)
+
+def with_retries(func, retries=3, backoff=1.0, retry_on=(Exception,), description='Call'):
+    """Calls func() and returns its result, retrying up to retries times with exponential backoff on retry_on."""
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except retry_on as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, backoff)
+            print(f"{description} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,212 @@
+import bisect
+import json
+import os
+import subprocess
+
+def probe_keyframes(input_file):
+    """Returns the sorted keyframe timestamps (seconds) of the first video stream, read from packet flags without decoding."""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',  # First video stream only
+        '-show_entries', 'packet=pts_time,flags',  # Packet timestamps and keyframe flag
+        '-of', 'csv=p=0',
+        input_file
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    keyframes = []
+    for line in result.stdout.decode('utf-8').splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.append(float(pts_time))
+    keyframes.sort()
+    return keyframes
+
+def snap_to_keyframe(keyframes, time, tolerance):
+    """Returns the keyframe closest to time if it is within tolerance seconds, otherwise None."""
+    i = bisect.bisect_left(keyframes, time)
+    candidates = [keyframes[j] for j in (i - 1, i) if 0 <= j < len(keyframes)]
+    if not candidates:
+        return None
+    closest = min(candidates, key=lambda k: abs(k - time))
+    return closest if abs(closest - time) <= tolerance else None
+
+def next_keyframe(keyframes, time):
+    """Returns the first keyframe at or after time, or None."""
+    i = bisect.bisect_left(keyframes, time)
+    return keyframes[i] if i < len(keyframes) else None
+
+def ffmpeg_stream_copy(input_file, start_time, end_time, targetname, keep_audio=True):
+    """Copies a subclip that starts on a keyframe without re-encoding."""
+    cmd = [
+        'ffmpeg',
+        '-y',  # Overwrite output file if it exists
+        '-ss', f"{start_time:.6f}",  # Start time, must be a keyframe
+        '-i', input_file,  # Input file
+        '-t', f"{end_time - start_time:.6f}",  # Duration
+        '-c', 'copy',  # Stream copy, no re-encoding
+        *([] if keep_audio else ['-an']),
+        '-avoid_negative_ts', 'make_zero',  # Start the output at timestamp 0
+        targetname
+    ]
+    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+# ffprobe 的 H.264 profile 名称 -> libx264 的 -profile:v 取值
+H264_PROFILES = {
+    'Constrained Baseline': 'baseline',
+    'Baseline': 'baseline',
+    'Main': 'main',
+    'High': 'high',
+    'High 10': 'high10',
+    'High 4:2:2': 'high422',
+    'High 4:4:4 Predictive': 'high444',
+}
+AUDIO_ENCODERS = {'aac': 'aac', 'mp3': 'libmp3lame'}
+
+def probe_stream_params(input_file):
+    """Reads the parameters of the first video and audio streams that a re-encoded head must share with a copied tail."""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name,profile,level,pix_fmt,sample_aspect_ratio,r_frame_rate,'
+                         'time_base,sample_rate,channels',
+        '-of', 'json',
+        input_file
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    params = {'video': None, 'audio': None}
+    for stream in json.loads(result.stdout).get('streams', []):
+        if stream.get('codec_type') in params and params[stream['codec_type']] is None:
+            params[stream['codec_type']] = stream
+    return params
+
+def matching_encode_args(params, keep_audio=True):
+    """ffmpeg output arguments that re-encode to the source's stream parameters, or None if they cannot be matched.
+
+    The concat demuxer does not check that joined pieces agree, so a head encoded with
+    a different profile, level, pixel format, SAR, frame rate, time base or audio
+    layout than the stream-copied tail plays back with a glitch at the join.
+    """
+    video = params.get('video')
+    if not video or video.get('codec_name') != 'h264' or video.get('profile') not in H264_PROFILES:
+        return None
+    args = [
+        '-c:v', 'libx264',  # Same codec as the copied tail
+        '-profile:v', H264_PROFILES[video['profile']],
+        '-pix_fmt', video['pix_fmt'],
+    ]
+    level = video.get('level')
+    if level and level > 0:
+        args += ['-level:v', f"{level / 10:g}"]  # ffprobe reports level 4.1 as 41
+    sar = video.get('sample_aspect_ratio')
+    if sar and sar not in ('0:1', 'N/A'):
+        args += ['-vf', f"setsar={sar.replace(':', '/')}"]
+    if video.get('r_frame_rate') not in (None, '0/0'):
+        args += ['-r', video['r_frame_rate']]
+    if video.get('time_base'):
+        args += ['-video_track_timescale', video['time_base'].split('/')[1]]
+
+    audio = params.get('audio')
+    if keep_audio and audio:
+        encoder = AUDIO_ENCODERS.get(audio.get('codec_name'))
+        if encoder is None:
+            return None
+        args += ['-c:a', encoder, '-ar', str(audio['sample_rate']), '-ac', str(audio['channels'])]
+    else:
+        args += ['-an']
+    return args
+
+def ffmpeg_encode_matching(input_file, start_time, end_time, targetname, encode_args):
+    """Re-encodes a subclip with encode_args from matching_encode_args."""
+    cmd = [
+        'ffmpeg',
+        '-y',  # Overwrite output file if it exists
+        '-ss', f"{start_time:.6f}",  # Start time
+        '-i', input_file,  # Input file
+        '-t', f"{end_time - start_time:.6f}",  # Duration
+        *encode_args,  # Codec parameters of the source streams
+        targetname
+    ]
+    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+def write_concat_list(segment_files, list_file):
+    """Writes a list file for the ffmpeg concat demuxer."""
+    with open(list_file, 'w', encoding='utf-8') as file:
+        for segment_file in segment_files:
+            path = os.path.abspath(segment_file).replace("'", "'\\''")
+            file.write(f"file '{path}'\n")
+
+def ffmpeg_concat_copy(segment_files, targetname):
+    """Joins segments with the ffmpeg concat demuxer, without re-encoding."""
+    list_file = f"{targetname}.txt"
+    write_concat_list(segment_files, list_file)
+    cmd = [
+        'ffmpeg',
+        '-y',  # Overwrite output file if it exists
+        '-f', 'concat',  # Use the concat demuxer
+        '-safe', '0',  # Allow absolute paths in the list file
+        '-i', list_file,  # List of segments to join
+        '-c', 'copy',  # Stream copy, no re-encoding
+        targetname
+    ]
+    try:
+        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    finally:
+        os.remove(list_file)
+
+def smart_cut(input_file, start_time, end_time, keyframes, targetname, reencode, keep_audio=True, snap_tolerance=0.1,
+              stream_params=None):
+    """Cuts one subclip, re-encoding only the part before the first keyframe.
+
+    Returns 'copy' when the cue starts on (or within snap_tolerance of) a keyframe and
+    is stream-copied, 'smart' when the partial-GOP head is re-encoded to the source's
+    stream parameters and joined to a stream-copied tail, and 'reencode' when the cue
+    is re-encoded whole with reencode: because it has no keyframe inside it, or because
+    the source's parameters cannot be matched (see matching_encode_args). reencode has
+    the signature of the split scripts' extractors: reencode(input_file, start_time,
+    end_time, targetname=...). stream_params is probed from input_file if not given.
+    """
+    snapped = snap_to_keyframe(keyframes, start_time, snap_tolerance)
+    if snapped is not None and snapped < end_time:
+        ffmpeg_stream_copy(input_file, snapped, end_time, targetname, keep_audio=keep_audio)
+        return 'copy'
+
+    keyframe = next_keyframe(keyframes, start_time)
+    if stream_params is None:
+        stream_params = probe_stream_params(input_file)
+    encode_args = matching_encode_args(stream_params, keep_audio=keep_audio)
+    if keyframe is None or keyframe >= end_time - snap_tolerance or encode_args is None:
+        reencode(input_file, start_time, end_time, targetname=targetname)
+        return 'reencode'
+
+    base, ext = os.path.splitext(targetname)
+    head_file = f"{base}.head{ext}"
+    tail_file = f"{base}.tail{ext}"
+    try:
+        ffmpeg_encode_matching(input_file, start_time, keyframe, head_file, encode_args)
+        ffmpeg_stream_copy(input_file, keyframe, end_time, tail_file, keep_audio=keep_audio)
+        ffmpeg_concat_copy([head_file, tail_file], targetname)
+    finally:
+        for file in (head_file, tail_file):
+            if os.path.exists(file):
+                os.remove(file)
+    return 'smart'
+
+def cut_segments_smart(input_file, cues, output_dir, reencode, keep_audio=True, snap_tolerance=0.1):
+    """Cuts (start_seconds, end_seconds) cues into output_dir/segment_NNN.mp4, probing the keyframe index once.
+
+    Returns a dict counting how many cues were copied, smart-cut and fully re-encoded.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    keyframes = probe_keyframes(input_file)
+    stream_params = probe_stream_params(input_file)
+    if matching_encode_args(stream_params, keep_audio=keep_audio) is None:
+        print(f"Cannot re-encode to the stream parameters of {input_file}, cues off keyframes are re-encoded whole")
+    stats = {'copy': 0, 'smart': 0, 'reencode': 0}
+    for i, (start_seconds, end_seconds) in enumerate(cues):
+        output_file = f"{output_dir}/segment_{i+1:03d}.mp4"
+        mode = smart_cut(input_file, start_seconds, end_seconds, keyframes, output_file, reencode,
+                         keep_audio=keep_audio, snap_tolerance=snap_tolerance, stream_params=stream_params)
+        stats[mode] += 1
+        print(f"Created {output_file} [{start_seconds:.3f} - {end_seconds:.3f}] ({mode})")
+    return stats
@@ -1,65 +1,194 @@
+import bisect
+import csv
 import os
-import re
+import shutil
 import subprocess
+import tempfile
+
+from build_manifest import BuildManifest, file_fingerprint, segment_fingerprint
+from smart_cut import cut_segments_smart, ffmpeg_concat_copy
+from srtlib import iter_srt
+from timestamps import format_timestamp, ms_to_seconds, parse_timestamp
+
+# Encoder arguments shared by every segment; also hashed into the build manifest fingerprint
+ENCODE_ARGS = [
+    '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',  # Ensure video dimensions are even
+    '-c:v', 'libx264',  # Re-encode video with libx264
+    '-preset', 'fast',  # Encoding speed/quality trade-off
+    '-c:a', 'aac',  # Keep audio with AAC encoding
+    '-b:a', '192k',  # Set audio bitrate
+]
 
 def parse_srt(srt_file):
     """Parses the SRT file and returns a list of tuples (start_time, end_time, text)."""
-    with open(srt_file, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    pattern = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-    matches = pattern.findall(content)
-
-    subtitles = []
-    for match in matches:
-        start_time = match[0].replace(',', '.')
-        end_time = match[1].replace(',', '.')
-        text = match[2].strip()
-        subtitles.append((start_time, end_time, text))
-    
-    return subtitles
-
-def hms_to_seconds(hms):
-    """Converts a time string HH:MM:SS,ms to seconds."""
-    h, m, s = hms.split(':')
-    s, ms = s.split('.')
-    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+    return [(format_timestamp(cue.start_ms, '.'), format_timestamp(cue.end_ms, '.'), cue.text) for cue in iter_srt(srt_file)]
 
 def ffmpeg_extract_subclip_with_audio(input_file, start_time, end_time, targetname=None):
     """Uses ffmpeg to extract and re-encode a subclip from a video file while keeping the audio."""
     cmd = [
         'ffmpeg',
         '-y',  # Overwrite output file if it exists
-        '-ss', str(start_time),  # Start time
+        '-ss', f"{start_time:.3f}",  # Start time
         '-i', input_file,  # Input file
-        '-to', str(end_time - start_time),  # End time
-        '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',  # Ensure video dimensions are even
-        '-c:v', 'libx264',  # Re-encode video with libx264
-        '-preset', 'fast',  # Encoding speed/quality trade-off
-        '-c:a', 'aac',  # Keep audio with AAC encoding
-        '-b:a', '192k',  # Set audio bitrate
+        '-to', f"{end_time - start_time:.3f}",  # End time
+        *ENCODE_ARGS,
         targetname
     ]
     subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
 
-def cut_video_with_audio(video_file, srt_file, output_dir):
-    """Cuts the video into segments based on the SRT file using ffmpeg while keeping the audio."""
+def cut_video_with_audio(video_file, srt_file, output_dir, manifest_path=None):
+    """Cuts the video into segments based on the SRT file using ffmpeg while keeping the audio.
+
+    With manifest_path, segments whose source file, cue times, cue text and encode
+    settings are unchanged since the last run are skipped.
+    """
     subtitles = parse_srt(srt_file)
 
     # Create the output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
+    manifest = BuildManifest(manifest_path) if manifest_path else None
+    source = file_fingerprint(video_file) if manifest else None
+
     for i, (start_time, end_time, text) in enumerate(subtitles):
-        start_seconds = hms_to_seconds(start_time)
-        end_seconds = hms_to_seconds(end_time)
-        
         output_file = f"{output_dir}/segment_{i+1:03d}.mp4"
+        if manifest:
+            fingerprint = segment_fingerprint(source=source, start=start_time, end=end_time, text=text,
+                                              settings=ENCODE_ARGS)
+            if manifest.is_fresh(output_file, fingerprint):
+                continue
+
+        start_seconds = ms_to_seconds(parse_timestamp(start_time))
+        end_seconds = ms_to_seconds(parse_timestamp(end_time))
         ffmpeg_extract_subclip_with_audio(video_file, start_seconds, end_seconds, targetname=output_file)
         print(f"Created {output_file} [{start_time} - {end_time}]")
 
-# Usage
-video_file = "preprocessed_video_no_audio.mp4"  # Replace with your video file path
-srt_file = "output_subtitle.srt"  # Replace with your SRT file path
-output_dir = "video_segments"  # Replace with your output directory
+        if manifest:
+            manifest.record(output_file, fingerprint)
+            manifest.save()
+
+def ffmpeg_segment_with_audio(input_file, split_points, output_pattern, segment_list):
+    """Encodes the video once and splits it at every split point with the ffmpeg segment muxer."""
+    times = ','.join(f"{t:.3f}" for t in split_points)
+    cmd = [
+        'ffmpeg',
+        '-y',  # Overwrite output files if they exist
+        '-i', input_file,  # Input file
+        *ENCODE_ARGS,
+        '-force_key_frames', times,  # Put a keyframe on every split point so cuts are exact
+        '-f', 'segment',  # Use the segment muxer
+        '-segment_times', times,  # Split points derived from the subtitle cues
+        '-segment_format', 'mp4',  # Container of each piece
+        '-segment_list', segment_list,  # Record the actual start/end time of each piece
+        '-segment_list_type', 'csv',
+        '-reset_timestamps', '1',  # Every piece starts at timestamp 0
+        output_pattern
+    ]
+    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+def read_segment_list(segment_list):
+    """Reads the segment muxer CSV list and returns a list of tuples (file, start_time, end_time)."""
+    base_dir = os.path.dirname(segment_list)
+    pieces = []
+    with open(segment_list, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if row:
+                pieces.append((os.path.join(base_dir, row[0]), float(row[1]), float(row[2])))
+    return pieces
+
+def cut_video_with_audio_single_pass(video_file, srt_file, output_dir, manifest_path=None):
+    """Cuts the video into segments based on the SRT file, decoding and encoding the source only once.
+
+    Every cue start and end becomes a split point of the segment muxer, so the source is
+    cut into pieces covering the gaps and the cues. Each cue's pieces are then moved (or,
+    for overlapping cues, stream-copy joined) to the same segment_NNN.mp4 layout that
+    cut_video_with_audio produces. Zero-length cues fall back to the per-cue extractor.
+
+    With manifest_path (fingerprinted like cut_video_with_audio), a run where only some
+    segments are out of date re-cuts just those cues one by one instead of the whole source.
+    """
+    subtitles = parse_srt(srt_file)
+
+    # Create the output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = BuildManifest(manifest_path) if manifest_path else None
+    if manifest:
+        source = file_fingerprint(video_file)
+        fingerprints = [segment_fingerprint(source=source, start=start_time, end=end_time, text=text,
+                                            settings=ENCODE_ARGS)
+                        for start_time, end_time, text in subtitles]
+        stale = [i for i in range(len(subtitles))
+                 if not manifest.is_fresh(f"{output_dir}/segment_{i+1:03d}.mp4", fingerprints[i])]
+        if len(stale) < len(subtitles):
+            # 只有部分字幕变了：逐条重切这些片段，不必把整集重新编码
+            print(f"Skipped {len(subtitles) - len(stale)} of {len(subtitles)} segments that are up to date")
+            for i in stale:
+                start_time, end_time, _ = subtitles[i]
+                output_file = f"{output_dir}/segment_{i+1:03d}.mp4"
+                ffmpeg_extract_subclip_with_audio(video_file, ms_to_seconds(parse_timestamp(start_time)),
+                                                  ms_to_seconds(parse_timestamp(end_time)), targetname=output_file)
+                print(f"Created {output_file} [{start_time} - {end_time}]")
+                manifest.record(output_file, fingerprints[i])
+                manifest.save()
+            return
+
+    cues = [(ms_to_seconds(parse_timestamp(start_time)), ms_to_seconds(parse_timestamp(end_time)))
+            for start_time, end_time, _ in subtitles]
+    split_points = sorted({t for cue in cues for t in cue if t > 0})
+    if not split_points:
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='segments_', dir=output_dir)
+    try:
+        segment_list = os.path.join(work_dir, 'pieces.csv')
+        ffmpeg_segment_with_audio(video_file, split_points, os.path.join(work_dir, 'piece_%05d.mp4'), segment_list)
+        pieces = read_segment_list(segment_list)
+
+        # 以每个片段的中点归属字幕，避免相邻切点落在同一帧时序号错位
+        midpoints = [(start + end) / 2 for _, start, end in pieces]
+        cue_pieces = []
+        usage = [0] * len(pieces)
+        for start_seconds, end_seconds in cues:
+            first = bisect.bisect_left(midpoints, start_seconds)
+            last = bisect.bisect_right(midpoints, end_seconds)
+            cue_pieces.append(range(first, last))
+            for j in range(first, last):
+                usage[j] += 1
+
+        for i, (start_time, end_time, text) in enumerate(subtitles):
+            output_file = f"{output_dir}/segment_{i+1:03d}.mp4"
+            indices = cue_pieces[i]
+            if len(indices) == 0:
+                start_seconds, end_seconds = cues[i]
+                ffmpeg_extract_subclip_with_audio(video_file, start_seconds, end_seconds, targetname=output_file)
+            elif len(indices) == 1:
+                piece_file = pieces[indices[0]][0]
+                usage[indices[0]] -= 1
+                if usage[indices[0]] == 0:
+                    os.replace(piece_file, output_file)
+                else:
+                    shutil.copyfile(piece_file, output_file)
+            else:
+                ffmpeg_concat_copy([pieces[j][0] for j in indices], output_file)
+            print(f"Created {output_file} [{start_time} - {end_time}]")
+            if manifest:
+                manifest.record(output_file, fingerprints[i])
+        if manifest:
+            manifest.save()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def cut_video_with_audio_smart(video_file, srt_file, output_dir, snap_tolerance=0.1):
+    """Cuts the video into segments based on the SRT file, stream-copying every cue that starts on a keyframe."""
+    cues = [(ms_to_seconds(cue.start_ms), ms_to_seconds(cue.end_ms)) for cue in iter_srt(srt_file)]
+    return cut_segments_smart(video_file, cues, output_dir, ffmpeg_extract_subclip_with_audio,
+                              keep_audio=True, snap_tolerance=snap_tolerance)
+
+if __name__ == "__main__":
+    # Usage
+    video_file = "preprocessed_video_no_audio.mp4"  # Replace with your video file path
+    srt_file = "output_subtitle.srt"  # Replace with your SRT file path
+    output_dir = "video_segments"  # Replace with your output directory
 
-cut_video_with_audio(video_file, srt_file, output_dir)
+    cut_video_with_audio_single_pass(video_file, srt_file, output_dir, manifest_path=f"{output_dir}/manifest.json")
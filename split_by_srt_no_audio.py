@@ -1,42 +1,35 @@
 import os
-import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from build_manifest import BuildManifest, file_fingerprint, segment_fingerprint
+from smart_cut import cut_segments_smart
+from srtlib import iter_srt
+from timestamps import format_timestamp, ms_to_seconds, parse_timestamp
+
+# Encoder arguments shared by every segment; also hashed into the build manifest fingerprint
+ENCODE_ARGS = [
+    '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',  # Ensure video dimensions are even
+    '-c:v', 'libx264',  # Re-encode video with libx264
+    '-preset', 'fast',  # Encoding speed/quality trade-off
+    '-an',  # Remove audio stream
+]
 
 def parse_srt(srt_file):
     """Parses the SRT file and returns a list of tuples (start_time, end_time, text)."""
-    with open(srt_file, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    pattern = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-    matches = pattern.findall(content)
-
-    subtitles = []
-    for match in matches:
-        start_time = match[0].replace(',', '.')
-        end_time = match[1].replace(',', '.')
-        text = match[2].strip()
-        subtitles.append((start_time, end_time, text))
-    
-    return subtitles
-
-def hms_to_seconds(hms):
-    """Converts a time string HH:MM:SS,ms to seconds."""
-    h, m, s = hms.split(':')
-    s, ms = s.split('.')
-    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-
-def ffmpeg_extract_subclip_force_reencode(input_file, start_time, end_time, targetname=None):
+    return [(format_timestamp(cue.start_ms, '.'), format_timestamp(cue.end_ms, '.'), cue.text) for cue in iter_srt(srt_file)]
+
+def ffmpeg_extract_subclip_force_reencode(input_file, start_time, end_time, targetname=None, threads=None):
     """Uses ffmpeg to extract and re-encode a subclip from a video file to avoid black screen."""
+    thread_args = ['-threads', str(threads)] if threads else []  # Limit x264 encoder threads
     cmd = [
         'ffmpeg',
         '-y',  # Overwrite output file if it exists
-        '-ss', str(start_time),  # Start time
+        '-ss', f"{start_time:.3f}",  # Start time
         '-i', input_file,  # Input file
-        '-to', str(end_time - start_time),  # End time
-        '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',  # Ensure video dimensions are even
-        '-c:v', 'libx264',  # Re-encode video with libx264
-        '-preset', 'fast',  # Encoding speed/quality trade-off
-        '-an',  # Remove audio stream
+        '-to', f"{end_time - start_time:.3f}",  # End time
+        *ENCODE_ARGS,
+        *thread_args,
         targetname
     ]
     subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
@@ -49,16 +42,99 @@ def cut_video(video_file, srt_file, output_dir):
     os.makedirs(output_dir, exist_ok=True)
 
     for i, (start_time, end_time, text) in enumerate(subtitles):
-        start_seconds = hms_to_seconds(start_time)
-        end_seconds = hms_to_seconds(end_time)
+        start_seconds = ms_to_seconds(parse_timestamp(start_time))
+        end_seconds = ms_to_seconds(parse_timestamp(end_time))
         
         output_file = f"{output_dir}/segment_{i+1:03d}.mp4"
         ffmpeg_extract_subclip_force_reencode(video_file, start_seconds, end_seconds, targetname=output_file)
         print(f"Created {output_file} [{start_time} - {end_time}]")
 
-# Usage
-video_file = "preprocessed_video_standard.mp4"  # Replace with your video file path
-srt_file = "output_subtitle.srt"  # Replace with your SRT file path
-output_dir = "video_segments"  # Replace with your output directory
+def cut_video_parallel(video_file, srt_file, output_dir, max_workers=None, threads_per_worker=None, manifest_path=None):
+    """Cuts the video into segments based on the SRT file, re-encoding several cues concurrently.
+
+    At most max_workers ffmpeg processes run at once (default: one per 4 cores), each
+    limited to threads_per_worker x264 threads (default: cores / max_workers) so the
+    workers together do not oversubscribe the machine. A failing cue is reported and
+    the remaining cues keep going; the failures are returned as a list of
+    (segment_index, output_file, error_message) tuples.
+
+    With manifest_path, segments whose source file, cue times, cue text and encode
+    settings are unchanged since the last run are skipped.
+    """
+    subtitles = parse_srt(srt_file)
+
+    # Create the output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    cpu_count = os.cpu_count() or 1
+    if max_workers is None:
+        max_workers = max(1, cpu_count // 4)
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpu_count // max_workers)
+
+    manifest = BuildManifest(manifest_path) if manifest_path else None
+    source = file_fingerprint(video_file) if manifest else None
+
+    failures = []
+    fingerprints = {}
+    total = len(subtitles)
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for i, (start_time, end_time, text) in enumerate(subtitles):
+            output_file = f"{output_dir}/segment_{i+1:03d}.mp4"
+            if manifest:
+                fingerprints[output_file] = segment_fingerprint(source=source, start=start_time, end=end_time,
+                                                                text=text, settings=ENCODE_ARGS)
+                if manifest.is_fresh(output_file, fingerprints[output_file]):
+                    skipped += 1
+                    continue
+            start_seconds = ms_to_seconds(parse_timestamp(start_time))
+            end_seconds = ms_to_seconds(parse_timestamp(end_time))
+            future = executor.submit(ffmpeg_extract_subclip_force_reencode, video_file, start_seconds, end_seconds,
+                                     targetname=output_file, threads=threads_per_worker)
+            futures[future] = (i + 1, output_file, start_time, end_time)
+
+        if skipped:
+            print(f"Skipped {skipped} of {total} segments that are up to date")
+        total = len(futures)
+
+        done = 0
+        for future in as_completed(futures):
+            index, output_file, start_time, end_time = futures[future]
+            done += 1
+            try:
+                future.result()
+            except subprocess.CalledProcessError as e:
+                stderr_lines = (e.stderr or b'').decode('utf-8', errors='replace').strip().splitlines()
+                message = stderr_lines[-1] if stderr_lines else f"ffmpeg exited with status {e.returncode}"
+                failures.append((index, output_file, message))
+                if manifest:
+                    manifest.forget(output_file)
+                print(f"[{done}/{total}] Failed {output_file} [{start_time} - {end_time}]: {message}")
+            else:
+                if manifest:
+                    manifest.record(output_file, fingerprints[output_file])
+                print(f"[{done}/{total}] Created {output_file} [{start_time} - {end_time}]")
+            if manifest:
+                # 每段完成即落盘，中途被杀掉也不会重做已编码的段
+                manifest.save()
+
+    failures.sort()
+    if failures:
+        print(f"{len(failures)} of {total} segments failed: {', '.join(str(index) for index, _, _ in failures)}")
+    return failures
+
+def cut_video_smart(video_file, srt_file, output_dir, snap_tolerance=0.1):
+    """Cuts the video into segments based on the SRT file, stream-copying every cue that starts on a keyframe."""
+    cues = [(ms_to_seconds(cue.start_ms), ms_to_seconds(cue.end_ms)) for cue in iter_srt(srt_file)]
+    return cut_segments_smart(video_file, cues, output_dir, ffmpeg_extract_subclip_force_reencode,
+                              keep_audio=False, snap_tolerance=snap_tolerance)
+
+if __name__ == "__main__":
+    # Usage
+    video_file = "preprocessed_video_standard.mp4"  # Replace with your video file path
+    srt_file = "output_subtitle.srt"  # Replace with your SRT file path
+    output_dir = "video_segments"  # Replace with your output directory
 
-cut_video(video_file, srt_file, output_dir)
+    cut_video_parallel(video_file, srt_file, output_dir, manifest_path=f"{output_dir}/manifest.json")
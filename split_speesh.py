@@ -1,3 +1,4 @@
+import numpy as np
 from pydub import AudioSegment
 
 def split_audio(audio_path, segment_length=30):
@@ -14,8 +15,69 @@ def split_audio(audio_path, segment_length=30):
     
     return segments
 
-# 使用示例
-audio_path = "extracted_audio.wav"
-segments = split_audio(audio_path)
+def frame_rms(samples, frame_length):
+    """Computes the RMS of consecutive non-overlapping frames of an int16 sample array."""
+    n_frames = len(samples) // frame_length
+    frames = samples[:n_frames * frame_length].reshape(n_frames, frame_length).astype(np.float32)
+    return np.sqrt(np.mean(frames * frames, axis=1))
 
-print("音频切割为多个片段:", segments)
+def choose_cut_frames(rms, target_frames, min_frames, max_frames, silence_threshold, smooth_frames=1):
+    """Picks cut points (frame indexes) in silences as close as possible to target_frames apart.
+
+    Within [min_frames, max_frames] after the previous cut, the cut goes to the silent
+    frame (smoothed RMS below silence_threshold) nearest the target length; if the
+    window has no silence, it goes to the quietest frame. Returns the cut frame indexes,
+    not including 0 or the end.
+    """
+    if smooth_frames > 1:
+        rms = np.convolve(rms, np.ones(smooth_frames, dtype=np.float32) / smooth_frames, mode='same')
+    cuts = []
+    start = 0
+    n_frames = len(rms)
+    while n_frames - start > max_frames:
+        lo, hi = start + min_frames, start + max_frames
+        window = rms[lo:hi]
+        distance = np.abs(np.arange(lo, hi) - (start + target_frames))
+        silent = window < silence_threshold
+        if silent.any():
+            cut = lo + int(np.argmin(np.where(silent, distance, np.iinfo(np.int64).max)))
+        else:
+            cut = lo + int(np.argmin(window))
+        cuts.append(cut)
+        start = cut
+    return cuts
+
+def split_audio_on_silence(audio_path, target_length=30, min_length=10, max_length=55,
+                           silence_thresh_db=-40, frame_ms=20, smooth_ms=200, export=False):
+    """Splits audio at silences near target_length seconds and yields (start_ms, end_ms, pcm_bytes).
+
+    The audio is decoded once to mono 16-bit PCM and frame RMS is computed vectorized
+    over the raw sample buffer. Chunks stay in memory as PCM bytes at the source sample
+    rate; with export=True each chunk is also written as segment_{start}_{end}.wav.
+    """
+    audio = AudioSegment.from_file(audio_path).set_channels(1).set_sample_width(2)
+    sample_rate = audio.frame_rate
+    samples = np.frombuffer(audio.raw_data, dtype=np.int16)
+
+    frame_length = sample_rate * frame_ms // 1000
+    rms = frame_rms(samples, frame_length)
+    silence_threshold = 32768 * 10 ** (silence_thresh_db / 20)
+    cuts = choose_cut_frames(rms, target_length * 1000 // frame_ms, min_length * 1000 // frame_ms,
+                             max_length * 1000 // frame_ms, silence_threshold, max(1, smooth_ms // frame_ms))
+
+    boundaries = [0] + [cut * frame_length for cut in cuts] + [len(samples)]
+    for first, last in zip(boundaries, boundaries[1:]):
+        start_ms = first * 1000 // sample_rate
+        end_ms = last * 1000 // sample_rate
+        pcm = samples[first:last].tobytes()
+        if export:
+            segment = AudioSegment(data=pcm, sample_width=2, frame_rate=sample_rate, channels=1)
+            segment.export(f"segment_{start_ms}_{end_ms}.wav", format="wav")
+        yield start_ms, end_ms, pcm
+
+if __name__ == "__main__":
+    # 使用示例
+    audio_path = "extracted_audio.wav"
+    segments = [(start_ms, end_ms) for start_ms, end_ms, _ in split_audio_on_silence(audio_path, export=True)]
+
+    print("音频按静音切割为多个片段:", segments)
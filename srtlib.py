@@ -0,0 +1,114 @@
+import re
+
+from timestamps import format_timestamp
+
+# HH:MM:SS,mmm --> HH:MM:SS,mmm (also accepts '.' as the millisecond separator and extra hour digits)
+TIMING_PATTERN = re.compile(r'\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})')
+
+class Cue:
+    """One subtitle entry with integer millisecond times. Multi-line text is kept joined with '\\n'."""
+    __slots__ = ('index', 'start_ms', 'end_ms', 'text')
+
+    def __init__(self, index, start_ms, end_ms, text):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+
+    @property
+    def start(self):
+        """Start time in seconds."""
+        return self.start_ms / 1000
+
+    @property
+    def end(self):
+        """End time in seconds."""
+        return self.end_ms / 1000
+
+    def __eq__(self, other):
+        if not isinstance(other, Cue):
+            return NotImplemented
+        return (self.index, self.start_ms, self.end_ms, self.text) == (other.index, other.start_ms, other.end_ms, other.text)
+
+    def __repr__(self):
+        return f"Cue({self.index!r}, {self.start_ms!r}, {self.end_ms!r}, {self.text!r})"
+
+def _timing_to_ms(match):
+    h1, m1, s1, ms1, h2, m2, s2, ms2 = match.groups()
+    start_ms = ((int(h1) * 60 + int(m1)) * 60 + int(s1)) * 1000 + int(ms1)
+    end_ms = ((int(h2) * 60 + int(m2)) * 60 + int(s2)) * 1000 + int(ms2)
+    return start_ms, end_ms
+
+def iter_cues(lines):
+    """Lazily parses SRT lines (an open file or any iterable of strings) into Cue objects.
+
+    Only the lines of the current cue are held in memory. A cue ends at a blank line,
+    at the next index/timing pair, or at the end of input, so the last cue is kept even
+    without a trailing blank line. Missing or non-numeric indexes are replaced by the
+    running position.
+    """
+    timing = None
+    index = None
+    text_lines = []
+    position = 0
+    pending_index = None  # 上一行是纯数字，可能是下一条字幕的序号
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith('\ufeff'):
+            line = line[1:]
+
+        match = TIMING_PATTERN.match(line)
+        if match:
+            if timing is not None:
+                if pending_index is not None and text_lines and text_lines[-1] == pending_index:
+                    text_lines.pop()
+                position += 1
+                yield Cue(index or position, *timing, '\n'.join(text_lines).strip())
+            timing = _timing_to_ms(match)
+            index = int(pending_index) if pending_index is not None else None
+            text_lines = []
+            pending_index = None
+            continue
+
+        stripped = line.strip()
+        if not stripped:
+            if timing is not None:
+                position += 1
+                yield Cue(index or position, *timing, '\n'.join(text_lines).strip())
+                timing = None
+                text_lines = []
+            pending_index = None
+            continue
+
+        pending_index = stripped if stripped.isdigit() else None
+        if timing is not None:
+            text_lines.append(stripped)
+
+    if timing is not None:
+        position += 1
+        yield Cue(index or position, *timing, '\n'.join(text_lines).strip())
+
+def iter_srt(srt_file):
+    """Lazily yields Cue objects from the SRT file, keeping only one cue in memory."""
+    with open(srt_file, 'r', encoding='utf-8-sig') as file:
+        yield from iter_cues(file)
+
+def parse_srt(srt_file):
+    """Returns a list of Cue objects parsed from the SRT file."""
+    return list(iter_srt(srt_file))
+
+def format_cue(index, start_ms, end_ms, text):
+    """Formats one SRT block, including the trailing blank line."""
+    return f"{index}\n{format_timestamp(start_ms)} --> {format_timestamp(end_ms)}\n{text}\n\n"
+
+def write_srt(cues, output_file, renumber=True):
+    """Writes Cue objects to an SRT file, numbering them from 1 unless renumber is False."""
+    with open(output_file, 'w', encoding='utf-8') as file:
+        buffer = []
+        for i, cue in enumerate(cues, 1):
+            buffer.append(format_cue(i if renumber else cue.index, cue.start_ms, cue.end_ms, cue.text))
+            if len(buffer) >= 1024:
+                file.write(''.join(buffer))
+                buffer.clear()
+        file.write(''.join(buffer))
@@ -0,0 +1,110 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+class SubtitleSprite:
+    """One rasterized subtitle: premultiplied RGB and inverse alpha, ready to blend."""
+    __slots__ = ('premultiplied', 'inverse_alpha', 'width', 'height')
+
+    def __init__(self, rgba):
+        rgba = rgba.astype(np.float32) / 255.0
+        alpha = rgba[:, :, 3:4]
+        self.premultiplied = rgba[:, :, :3] * alpha * 255.0
+        self.inverse_alpha = 1.0 - alpha
+        self.height, self.width = rgba.shape[:2]
+
+def render_text(text, font, color='white', stroke_width=0, stroke_color='black'):
+    """Rasterizes text with PIL into a tight RGBA array (h, w, 4)."""
+    left, top, right, bottom = ImageDraw.Draw(Image.new('RGBA', (1, 1))).multiline_textbbox(
+        (0, 0), text, font=font, stroke_width=stroke_width, align='center')
+    # 居中的多行文本在新版 Pillow 里会得到小数坐标，向外取整成像素边界
+    left, top, right, bottom = math.floor(left), math.floor(top), math.ceil(right), math.ceil(bottom)
+    width = max(1, right - left)
+    height = max(1, bottom - top)
+    image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(image).multiline_text(
+        (-left, -top), text, font=font, fill=ImageColor.getrgb(color), align='center',
+        stroke_width=stroke_width, stroke_fill=ImageColor.getrgb(stroke_color))
+    return np.asarray(image)
+
+class SubtitleAtlas:
+    """Renders each distinct subtitle text once and keeps the sprites for reuse.
+
+    Replaces a TextClip per segment (an ImageMagick call per clip): sprites are keyed by
+    (text, font, size, color), rendered concurrently by render_all, and blitted into
+    frames by overlay_subtitle. FreeType faces are not thread-safe, so every rendering
+    thread loads its own copy of the font.
+    """
+
+    def __init__(self, font_path, fontsize=28, color='white', stroke_width=0, stroke_color='black'):
+        self.font_path = font_path
+        self.fontsize = fontsize
+        self.color = color
+        self.stroke_width = stroke_width
+        self.stroke_color = stroke_color
+        self._fonts = threading.local()
+        self._sprites = {}
+        self._lock = threading.Lock()
+
+    def _font(self):
+        font = getattr(self._fonts, 'font', None)
+        if font is None:
+            font = self._fonts.font = ImageFont.truetype(self.font_path, self.fontsize)
+        return font
+
+    def _key(self, text):
+        return (text, self.font_path, self.fontsize, self.color, self.stroke_width, self.stroke_color)
+
+    def sprite(self, text):
+        """Returns the sprite for text, rendering it on first use."""
+        key = self._key(text)
+        with self._lock:
+            sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = SubtitleSprite(render_text(text, self._font(), self.color, self.stroke_width, self.stroke_color))
+            with self._lock:
+                sprite = self._sprites.setdefault(key, sprite)
+        return sprite
+
+    def render_all(self, texts, max_workers=4):
+        """Renders every distinct text up front on max_workers threads; returns the sprites in order."""
+        unique_texts = [text for text in dict.fromkeys(texts) if self._key(text) not in self._sprites]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(self.sprite, unique_texts))
+        return [self.sprite(text) for text in texts]
+
+def blit(frame, sprite, x, y):
+    """Alpha-blends sprite into frame at (x, y), touching only the sprite's bounding box.
+
+    frame is modified in place and returned; parts of the sprite outside the frame are clipped.
+    """
+    frame_height, frame_width = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + sprite.width, frame_width), min(y + sprite.height, frame_height)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+    sx, sy = x0 - x, y0 - y
+    region = frame[y0:y1, x0:x1, :3]
+    blended = region * sprite.inverse_alpha[sy:sy + y1 - y0, sx:sx + x1 - x0]
+    blended += sprite.premultiplied[sy:sy + y1 - y0, sx:sx + x1 - x0]
+    np.clip(blended, 0, 255, out=blended)
+    region[...] = (blended + 0.5).astype(frame.dtype)
+    return frame
+
+def bottom_center(frame_size, sprite, margin=0):
+    """Position of a sprite centered horizontally and resting on the bottom edge, like ('center', 'bottom')."""
+    width, height = frame_size
+    return (width - sprite.width) // 2, height - sprite.height - margin
+
+def overlay_subtitle(clip, sprite, margin=0):
+    """Returns clip with sprite burned into every frame at the bottom center."""
+    x, y = bottom_center(clip.size, sprite, margin)
+
+    def draw(frame):
+        # 读取器缓存并重复返回的帧是只读的，只有这种帧才需要复制；上游变换产出的新数组直接原地绘制
+        return blit(frame if frame.flags.writeable else frame.copy(), sprite, x, y)
+
+    return clip.fl_image(draw)
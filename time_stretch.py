@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dub_track import decode_float32
+
+def _best_offset(region, template):
+    """Index in region where template fits best, by FFT cross-correlation."""
+    n_lags = len(region) - len(template) + 1
+    n_fft = 1 << (len(region) + len(template) - 1).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(region, n_fft) * np.conj(np.fft.rfft(template, n_fft)), n_fft)
+    return int(np.argmax(correlation[:n_lags]))
+
+def wsola(samples, rate, sample_rate, frame_ms=40, tolerance_ms=10):
+    """Changes the tempo of (samples, channels) float32 audio by rate (>1 is faster) without changing pitch.
+
+    WSOLA: Hann-windowed frames are overlap-added at half-frame hops; each frame is
+    taken from within tolerance_ms of its nominal position, at the offset whose
+    mono waveform best continues the previous frame. Output length is len/rate.
+    """
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    frame = int(sample_rate * frame_ms / 1000) // 2 * 2
+    hop = frame // 2
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+    out_len = int(round(len(samples) / rate))
+    if abs(rate - 1.0) < 1e-3 or len(samples) < frame:
+        return samples[:out_len]
+
+    window = np.hanning(frame + 1)[:frame].astype(np.float32)[:, None]  # 周期 Hann 窗，50% 重叠时和为 1
+    padding = ((tolerance, frame + hop + tolerance), (0, 0))
+    padded = np.pad(samples, padding)
+    mono = padded.mean(axis=1)
+
+    n_frames = out_len // hop + 1
+    output = np.zeros((n_frames * hop + frame, samples.shape[1]), dtype=np.float32)
+    position = 0
+    for k in range(n_frames):
+        nominal = min(int(k * hop * rate), len(samples))
+        if k:
+            # 模板是上一帧自然延续的位置，在容差范围内找最相似的一段
+            template = mono[position + hop + tolerance:position + hop + tolerance + frame]
+            region = mono[nominal:nominal + frame + 2 * tolerance]
+            position = nominal - tolerance + _best_offset(region, template)
+        output[k * hop:k * hop + frame] += padded[position + tolerance:position + tolerance + frame] * window
+    return output[:out_len]
+
+def fit_to_window(samples, sample_rate, window_duration, max_rate=1.5, fade_ms=20):
+    """Makes samples fit in window_duration seconds: speeds up by at most max_rate, then trims with a fade-out.
+
+    Lines that already fit are returned unchanged. Returns (samples, rate, trimmed).
+    """
+    target = max(1, int(window_duration * sample_rate))
+    if len(samples) <= target:
+        return samples, 1.0, False
+    rate = min(len(samples) / target, max_rate)
+    stretched = wsola(samples, rate, sample_rate)
+    if len(stretched) <= target:
+        return stretched, rate, False
+    stretched = stretched[:target].copy()
+    fade = min(target, int(sample_rate * fade_ms / 1000))
+    stretched[target - fade:] *= np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+    return stretched, rate, True
+
+def _fit_file(job):
+    audio_file, window_duration, sample_rate, channels, max_rate = job
+    return fit_to_window(decode_float32(audio_file, sample_rate, channels), sample_rate, window_duration, max_rate)
+
+def fit_files(audio_files, window_durations, sample_rate=44100, channels=2, max_rate=1.5, max_workers=None):
+    """Decodes and fits each audio file into its window on a process pool, yielding (samples, rate, trimmed) in order."""
+    jobs = [(audio_file, window_duration, sample_rate, channels, max_rate)
+            for audio_file, window_duration in zip(audio_files, window_durations)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(_fit_file, jobs, chunksize=4)
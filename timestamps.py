@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import numpy as np
+
+NS_PER_MS = 1_000_000
+NS_PER_SECOND = 1_000_000_000
+
+def format_timestamp(ms, separator=','):
+    """Formats integer milliseconds as an SRT timestamp HH:MM:SS,mmm."""
+    seconds, ms = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}{separator}{ms:03}"
+
+def parse_timestamp(hms):
+    """Converts a time string HH:MM:SS,mmm (or HH:MM:SS.mmm) to integer milliseconds."""
+    h, m, s = hms.strip().split(':')
+    s, _, ms = s.replace(',', '.').partition('.')
+    return ((int(h) * 60 + int(m)) * 60 + int(s)) * 1000 + int(ms.ljust(3, '0')[:3])
+
+def seconds_to_ms(seconds):
+    """Rounds float seconds to integer milliseconds."""
+    return int(round(seconds * 1000))
+
+def ms_to_seconds(ms):
+    """Converts integer milliseconds to float seconds for APIs that want seconds."""
+    return ms / 1000
+
+def ns_to_ms(ns):
+    """Truncates integer nanoseconds to milliseconds, exactly."""
+    return ns // NS_PER_MS
+
+def timedelta_to_ms(delta):
+    """Converts a datetime.timedelta (as returned by the Speech client) to integer milliseconds, exactly."""
+    return delta // timedelta(milliseconds=1)
+
+def parse_offsets_ns(offset_strs):
+    """Converts a sequence of '1.250s' offset strings to an int64 NumPy array of nanoseconds in bulk."""
+    wholes = []
+    fractions = []
+    for offset_str in offset_strs:
+        whole, _, fraction = (offset_str or '0s').rstrip('s').partition('.')
+        wholes.append(whole or '0')
+        fractions.append(fraction[:9].ljust(9, '0'))
+    if not wholes:
+        return np.zeros(0, dtype=np.int64)
+    return np.array(wholes).astype(np.int64) * NS_PER_SECOND + np.array(fractions).astype(np.int64)
+
+def durations_to_ns(durations):
+    """Converts a sequence of {'seconds', 'nanos'} durations to an int64 NumPy array of nanoseconds in bulk."""
+    seconds = np.array([str((d or {}).get('seconds', 0)) for d in durations]).astype(np.int64)
+    nanos = np.array([(d or {}).get('nanos', 0) for d in durations], dtype=np.int64)
+    return seconds * NS_PER_SECOND + nanos
@@ -0,0 +1,118 @@
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from retry import with_retries
+from timestamps import timedelta_to_ms
+
+SAMPLE_WIDTH = 2  # LINEAR16
+
+def read_wav_pcm(wav_file_path):
+    """Reads a mono 16-bit WAV file and returns (pcm_bytes, sample_rate)."""
+    with wave.open(wav_file_path, 'rb') as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"{wav_file_path} must be mono 16-bit PCM")
+        return wav.readframes(wav.getnframes()), wav.getframerate()
+
+class GoogleRecognizer:
+    """Synchronous Speech-to-Text recognizer for one short window of LINEAR16 audio."""
+
+    def __init__(self, language_code="zh-CN", client=None):
+        from google.cloud import speech_v1p1beta1 as speech
+        self.speech = speech
+        self.client = client or speech.SpeechClient()
+        self.language_code = language_code
+
+    def __call__(self, pcm, sample_rate, offset_ms=0):
+        """Returns a list of (word, start_ms, end_ms) relative to the start of pcm."""
+        config = self.speech.RecognitionConfig(
+            encoding=self.speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=sample_rate,
+            language_code=self.language_code,
+            enable_word_time_offsets=True,  # 启用时间戳
+            enable_automatic_punctuation=True  # 启用自动标点符号
+        )
+        response = self.client.recognize(config=config, audio=self.speech.RecognitionAudio(content=pcm))
+        words = []
+        for result in response.results:
+            for word_info in result.alternatives[0].words:
+                words.append((word_info.word, timedelta_to_ms(word_info.start_time), timedelta_to_ms(word_info.end_time)))
+        return words
+
+class StubRecognizer:
+    """Offline recognizer for tests: returns the words of a known global timeline that fall inside each window.
+
+    Recognizers are called as recognizer(pcm, sample_rate, offset_ms); the stub uses
+    offset_ms and the pcm length to find its window, so it needs no network and no
+    real speech. fail_times makes the first N calls raise, to exercise the retry path.
+    """
+
+    def __init__(self, words, fail_times=0):
+        self.words = sorted(words, key=lambda word: word[1])
+        self.fail_times = fail_times
+        self.calls = 0
+
+    def __call__(self, pcm, sample_rate, offset_ms=0):
+        self.calls += 1
+        if self.calls <= self.fail_times:
+            raise RuntimeError("stub recognizer failure")
+        end_ms = offset_ms + len(pcm) * 1000 // (SAMPLE_WIDTH * sample_rate)
+        return [(word, start - offset_ms, end - offset_ms)
+                for word, start, end in self.words if start >= offset_ms and end <= end_ms]
+
+def plan_windows(duration_ms, window_ms, overlap_ms):
+    """Returns (start_ms, end_ms, keep_from_ms, keep_to_ms) for overlapping windows covering the audio.
+
+    Each window keeps the words whose midpoint lies between the middles of its overlaps
+    with the previous and the next window, so every word is kept exactly once.
+    """
+    if overlap_ms >= window_ms:
+        raise ValueError("overlap must be shorter than the window")
+    step = window_ms - overlap_ms
+    starts = list(range(0, max(duration_ms - overlap_ms, 1), step))
+    windows = []
+    for k, start in enumerate(starts):
+        end = min(start + window_ms, duration_ms)
+        keep_from = 0 if k == 0 else start + overlap_ms // 2
+        keep_to = float('inf') if k == len(starts) - 1 else starts[k + 1] + overlap_ms // 2
+        windows.append((start, end, keep_from, keep_to))
+    return windows
+
+def _recognize_with_retry(recognizer, pcm, sample_rate, offset_ms, retries, backoff, retry_on):
+    return with_retries(lambda: recognizer(pcm, sample_rate, offset_ms=offset_ms), retries, backoff, retry_on,
+                        description=f"Window at {offset_ms} ms")
+
+def transcribe_long_audio(pcm, sample_rate, recognizer=None, window_seconds=55, overlap_seconds=5,
+                          max_in_flight=8, retries=3, backoff=1.0, retry_on=(Exception,)):
+    """Transcribes long mono LINEAR16 audio by recognizing overlapping windows concurrently.
+
+    At most max_in_flight windows are being recognized at once. A failing window is
+    retried with exponential backoff. Word offsets are shifted onto the global timeline
+    and the overlap is deduplicated. Returns a list of (word, start_ms, end_ms) sorted
+    by start time.
+    """
+    recognizer = recognizer or GoogleRecognizer()
+    bytes_per_ms = SAMPLE_WIDTH * sample_rate / 1000
+    duration_ms = int(len(pcm) / bytes_per_ms)
+    windows = plan_windows(duration_ms, window_seconds * 1000, overlap_seconds * 1000)
+
+    def run(window):
+        start, end, keep_from, keep_to = window
+        # 按采样点对齐切片，避免切在半个采样中间
+        first_byte = int(start * bytes_per_ms) // SAMPLE_WIDTH * SAMPLE_WIDTH
+        last_byte = int(end * bytes_per_ms) // SAMPLE_WIDTH * SAMPLE_WIDTH
+        local_words = _recognize_with_retry(recognizer, pcm[first_byte:last_byte], sample_rate, start,
+                                            retries, backoff, retry_on)
+        kept = []
+        for word, word_start, word_end in local_words:
+            word_start += start
+            word_end += start
+            if keep_from <= (word_start + word_end) / 2 < keep_to:
+                kept.append((word, word_start, word_end))
+        return kept
+
+    words = []
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for kept in executor.map(run, windows):
+            words.extend(kept)
+    words.sort(key=lambda word: word[1])
+    return words
@@ -0,0 +1,179 @@
+import argparse
+import glob
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio2srt import align_words_to_segments, clean_text, split_transcript_by_punctuation
+from srtlib import Cue, write_srt
+from timestamps import durations_to_ns, ns_to_ms, parse_offsets_ns
+from transcript_stream import iter_results
+
+# startOffset: "0.200s" (Speech v2 batch output) / startTime: {seconds, nanos} (v1 JSON)
+SCHEMA_KEYS = {
+    'offset': ('startOffset', 'endOffset'),
+    'duration': ('startTime', 'endTime'),
+}
+
+class TranscriptColumns:
+    """Word timings of a whole transcript as parallel arrays.
+
+    start_ns / end_ns are int64 arrays with one entry per word. The cleaned words are
+    concatenated into text, and word i is text[text_offsets[i]:text_offsets[i + 1]].
+    Result r owns words result_offsets[r]:result_offsets[r + 1] and its punctuated
+    transcript is transcripts[r].
+    """
+    __slots__ = ('start_ns', 'end_ns', 'text', 'text_offsets', 'result_offsets', 'transcripts')
+
+    def __init__(self, start_ns, end_ns, text, text_offsets, result_offsets, transcripts):
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.text = text
+        self.text_offsets = text_offsets
+        self.result_offsets = result_offsets
+        self.transcripts = transcripts
+
+    def __len__(self):
+        return len(self.start_ns)
+
+    def words(self, first, last):
+        """Returns the cleaned words first..last-1 as a list."""
+        offsets = self.text_offsets[first:last + 1].tolist()
+        return [self.text[a:b] for a, b in zip(offsets, offsets[1:])]
+
+def detect_schema(result):
+    """Returns 'offset' or 'duration' from the first timed word of a result, or None if it has none."""
+    for word_info in result['alternatives'][0].get('words', ()):
+        for schema, keys in SCHEMA_KEYS.items():
+            if keys[0] in word_info or keys[1] in word_info:
+                return schema
+    return None
+
+def compile_extractor(schema):
+    """Returns a function mapping a word list to (start_ns, end_ns) int64 arrays for the given schema."""
+    start_key, end_key = SCHEMA_KEYS[schema]
+    if schema == 'offset':
+        def extract(words_info):
+            return (parse_offsets_ns([word_info.get(start_key) for word_info in words_info]),
+                    parse_offsets_ns([word_info.get(end_key) for word_info in words_info]))
+    else:
+        def extract(words_info):
+            return (durations_to_ns([word_info.get(start_key) for word_info in words_info]),
+                    durations_to_ns([word_info.get(end_key) for word_info in words_info]))
+    return extract
+
+def read_columns(json_file_path, schema='auto'):
+    """Streams a transcript JSON file into TranscriptColumns, detecting the offset schema once per file."""
+    results = iter_results(json_file_path)
+    buffered = []
+    if schema == 'auto':
+        schema = None
+        for result in results:
+            buffered.append(result)
+            schema = detect_schema(result)
+            if schema:
+                break
+        schema = schema or 'offset'
+    extract = compile_extractor(schema)
+
+    starts, ends, texts, transcripts = [], [], [], []
+    word_lengths = []
+    result_offsets = [0]
+    for result in itertools.chain(buffered, results):
+        alternative = result['alternatives'][0]
+        if 'words' not in alternative:
+            continue
+        words_info = alternative['words']
+        start_ns, end_ns = extract(words_info)
+        words = [clean_text(word_info.get('word', '')) for word_info in words_info]
+
+        starts.append(start_ns)
+        ends.append(end_ns)
+        texts.extend(words)
+        word_lengths.extend(len(word) for word in words)
+        transcripts.append(alternative.get('transcript', ''))
+        result_offsets.append(result_offsets[-1] + len(words))
+
+    text_offsets = np.zeros(len(word_lengths) + 1, dtype=np.int64)
+    np.cumsum(word_lengths, out=text_offsets[1:])
+    return TranscriptColumns(
+        np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64),
+        np.concatenate(ends) if ends else np.zeros(0, dtype=np.int64),
+        "".join(texts),
+        text_offsets,
+        np.array(result_offsets, dtype=np.int64),
+        transcripts,
+    )
+
+def columns_to_cues(columns):
+    """Segments the transcript by punctuation and yields one Cue per segment that has words."""
+    start_ms = ns_to_ms(columns.start_ns)
+    end_ms = ns_to_ms(columns.end_ns)
+    result_offsets = columns.result_offsets.tolist()
+    idx = 1
+    for r, transcript in enumerate(columns.transcripts):
+        first_word, last_word = result_offsets[r], result_offsets[r + 1]
+        words = columns.words(first_word, last_word)
+        for word_range in align_words_to_segments(split_transcript_by_punctuation(transcript), words):
+            if word_range is None:
+                continue
+            first, last = word_range
+            text = "".join(words[first:last + 1]).strip()
+            yield Cue(idx, int(start_ms[first_word + first]), int(end_ms[first_word + last]), text)
+            idx += 1
+
+def convert_file(json_file_path, output_srt_file, schema='auto'):
+    """Converts one transcript JSON file to SRT and returns the number of words read."""
+    columns = read_columns(json_file_path, schema)
+    write_srt(columns_to_cues(columns), output_srt_file)
+    return len(columns)
+
+def expand_inputs(inputs):
+    """Expands files, directories (*.json inside) and glob patterns into a sorted list of JSON files."""
+    files = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            files.update(glob.glob(os.path.join(pattern, '*.json')))
+        else:
+            files.update(glob.glob(pattern) or [pattern])
+    return sorted(files)
+
+def _convert_job(job):
+    json_file_path, output_srt_file, schema = job
+    try:
+        return json_file_path, convert_file(json_file_path, output_srt_file, schema), None
+    except Exception as e:
+        return json_file_path, 0, str(e)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert Speech-to-Text transcript JSON files to SRT.")
+    parser.add_argument('inputs', nargs='+', help="Transcript JSON files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', help="Directory for the SRT files (default: next to each input)")
+    parser.add_argument('--schema', choices=['auto', *SCHEMA_KEYS], default='auto', help="Word offset schema")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="Number of files converted in parallel")
+    args = parser.parse_args()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    jobs = []
+    for json_file_path in expand_inputs(args.inputs):
+        base = os.path.splitext(os.path.basename(json_file_path))[0] + '.srt'
+        output_dir = args.output_dir or os.path.dirname(json_file_path)
+        jobs.append((json_file_path, os.path.join(output_dir, base), args.schema))
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        for json_file_path, word_count, error in executor.map(_convert_job, jobs, chunksize=8):
+            if error:
+                failed += 1
+                print(f"Failed {json_file_path}: {error}")
+            else:
+                print(f"Converted {json_file_path} ({word_count} words)")
+    print(f"{len(jobs) - failed} of {len(jobs)} transcripts converted")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
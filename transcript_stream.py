@@ -0,0 +1,89 @@
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+class _JSONStream:
+    """A read buffer over a text file that decodes one JSON value at a time."""
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        """Drops the consumed prefix and appends the next chunk; returns False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.file.read(size or self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self):
+        """Skips whitespace and returns the next character, or '' at end of file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in transcript JSON, found {found!r}")
+        self.pos += 1
+
+    def _delimited(self, end):
+        """True when the value ending at end is followed by a delimiter or the end of the file."""
+        if end < len(self.buffer):
+            return self.buffer[end] in _WHITESPACE + ',}]'
+        return self.eof
+
+    def decode(self):
+        """Decodes the next complete JSON value, reading more input until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # 值还没读完整：按当前缓冲区大小加倍读取，摊销后仍是线性的
+                if not self._fill(max(self.chunk_size, len(self.buffer))):
+                    raise
+                continue
+            if isinstance(value, (int, float)) and not self._delimited(end) and self._fill():
+                # 数字可能被分块截断（如 "123" | ".456"），后面不是分隔符就多读一块再解码
+                continue
+            self.pos = end
+            return value
+
+def iter_results(json_file, chunk_size=1 << 16):
+    """Yields the entries of the top-level 'results' array of a Speech-to-Text transcript one at a time.
+
+    Other top-level keys are decoded and discarded, so peak memory is bounded by the
+    largest single result rather than the size of the file.
+    """
+    with open(json_file, 'r', encoding='utf-8') as file:
+        stream = _JSONStream(file, chunk_size)
+        stream.expect('{')
+        while stream.peek() != '}':
+            key = stream.decode()
+            stream.expect(':')
+            if key != 'results':
+                stream.decode()
+            else:
+                stream.expect('[')
+                while stream.peek() != ']':
+                    yield stream.decode()
+                    if stream.peek() == ',':
+                        stream.pos += 1
+                stream.expect(']')
+            if stream.peek() == ',':
+                stream.pos += 1
+        stream.expect('}')
@@ -1,42 +1,23 @@
-import re
-from googletrans import Translator
+from srtlib import Cue, iter_srt, write_srt
+from translation import BatchTranslator, GoogletransBackend
+from translation_memory import TranslationMemory
 
 def parse_srt(srt_file):
-    """Parses the SRT file and returns a list of tuples (index, start_time, end_time, text)."""
-    with open(srt_file, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    pattern = re.compile(r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-    matches = pattern.findall(content)
+    """Parses the SRT file and returns a list of Cue objects with single-line text."""
+    return [Cue(cue.index, cue.start_ms, cue.end_ms, cue.text.replace('\n', ' ')) for cue in iter_srt(srt_file)]
 
-    subtitles = []
-    for match in matches:
-        index = match[0]
-        start_time = match[1]
-        end_time = match[2]
-        text = match[3].replace('\n', ' ').strip()
-        subtitles.append((index, start_time, end_time, text))
-    
-    return subtitles
-
-def translate_text(text, target_language='en'):
-    """Translates the given text to the target language."""
-    translator = Translator()
-    translated = translator.translate(text, dest=target_language)
-    return translated.text
-
-def translate_srt(srt_file, output_file):
+def translate_srt(srt_file, output_file, target_language='en', translator=None):
     """Translates the SRT file to English and saves the output to a new file."""
+    translator = translator or BatchTranslator(GoogletransBackend(), memory=TranslationMemory())
     subtitles = parse_srt(srt_file)
-    translated_subtitles = []
 
-    for index, start_time, end_time, text in subtitles:
-        translated_text = translate_text(text)
-        translated_subtitles.append((index, start_time, end_time, translated_text))
+    translated_texts = translator.translate([cue.text for cue in subtitles], target_language=target_language)
+    if translator.memory is not None:
+        print(f"Translation memory hit rate: {translator.memory.hit_rate():.1%}, {translator.requests} requests")
+    translated_subtitles = [Cue(cue.index, cue.start_ms, cue.end_ms, translated_text)
+                            for cue, translated_text in zip(subtitles, translated_texts)]
 
-    with open(output_file, 'w', encoding='utf-8') as file:
-        for index, start_time, end_time, text in translated_subtitles:
-            file.write(f"{index}\n{start_time} --> {end_time}\n{text}\n\n")
+    write_srt(translated_subtitles, output_file, renumber=False)
 
 # Usage
 srt_file_path = 'corrected_output_subtitle.srt'
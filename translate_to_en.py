@@ -1,43 +1,26 @@
-from google.cloud import translate_v2 as translate
-import os
-import re
+from srtlib import Cue, iter_srt, write_srt
+from translation import BatchTranslator, GoogleCloudBackend
+from translation_memory import TranslationMemory
 
 def parse_srt_for_subtitles(srt_file):
-    """Parses the SRT file and returns a list of subtitles."""
-    with open(srt_file, 'r', encoding="utf-8") as file:
-        content = file.read()
-    
-    pattern = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-    matches = pattern.findall(content)
-
-    subtitles = []
-    for match in matches:
-        start_time = match[0]
-        end_time = match[1]
-        text = match[2].replace('\n', ' ').strip()
-        subtitles.append((start_time, end_time, text))
-    
-    return subtitles
-
-def translate_subtitles(subtitles, target_language='en'):
-    """Translates a list of subtitles using Google Cloud Translation API."""
-    translate_client = translate.Client()
-
-    translated_subtitles = []
-    for start_time, end_time, text in subtitles:
-        translation = translate_client.translate(text, target_language=target_language)
-        translated_text = translation['translatedText']
-        translated_subtitles.append((start_time, end_time, translated_text))
-
-    return translated_subtitles
+    """Parses the SRT file and returns a list of tuples (start_ms, end_ms, text)."""
+    return [(cue.start_ms, cue.end_ms, cue.text.replace('\n', ' ')) for cue in iter_srt(srt_file)]
+
+def translate_subtitles(subtitles, target_language='en', translator=None):
+    """Translates a list of subtitles using Google Cloud Translation API, many cues per request."""
+    translator = translator or BatchTranslator(GoogleCloudBackend(), memory=TranslationMemory())
+
+    translated_texts = translator.translate([text for _, _, text in subtitles], target_language=target_language)
+    print(f"Translated {len(subtitles)} subtitles in {translator.requests} requests")
+    if translator.memory is not None:
+        print(f"Translation memory hit rate: {translator.memory.hit_rate():.1%}")
+
+    return [(start_time, end_time, translated_text)
+            for (start_time, end_time, _), translated_text in zip(subtitles, translated_texts)]
 
 def save_translated_srt(translated_subtitles, output_srt_file):
     """Saves the translated subtitles back to an SRT file."""
-    with open(output_srt_file, 'w', encoding='utf-8') as file:
-        for i, (start_time, end_time, text) in enumerate(translated_subtitles):
-            file.write(f"{i+1}\n")
-            file.write(f"{start_time} --> {end_time}\n")
-            file.write(f"{text}\n\n")
+    write_srt((Cue(i + 1, start_ms, end_ms, text) for i, (start_ms, end_ms, text) in enumerate(translated_subtitles)), output_srt_file)
 
 def main():
     srt_file_path = 'corrected_output_subtitle.srt'
@@ -0,0 +1,127 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from retry import with_retries
+
+class GoogleCloudBackend:
+    """Google Cloud Translation v2. One client is created and reused for every batch."""
+    engine = 'google-cloud-v2'
+    max_batch_size = 128  # API limit on text segments per request
+    max_batch_chars = 30000  # API limit on code points per request
+
+    def __init__(self, client=None):
+        if client is None:
+            from google.cloud import translate_v2 as translate
+            client = translate.Client()
+        self.client = client
+
+    def translate(self, texts, target_language, source_language=None):
+        results = self.client.translate(texts, target_language=target_language, source_language=source_language,
+                                        format_='text')
+        return [result['translatedText'] for result in results]
+
+class GoogletransBackend:
+    """Unofficial googletrans client, kept for translate.py. One Translator is reused."""
+    engine = 'googletrans'
+    max_batch_size = 50
+    max_batch_chars = 5000
+
+    def __init__(self, translator=None):
+        if translator is None:
+            from googletrans import Translator
+            translator = Translator()
+        self.translator = translator
+
+    def translate(self, texts, target_language, source_language=None):
+        results = self.translator.translate(texts, dest=target_language, src=source_language or 'auto')
+        return [result.text for result in results]
+
+class FakeBackend:
+    """Offline stand-in for tests: tags each text with the target language and counts requests."""
+    engine = 'fake'
+    max_batch_size = 128
+    max_batch_chars = 30000
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def translate(self, texts, target_language, source_language=None):
+        with self._lock:
+            self.requests += 1
+        return [f"[{target_language}] {text}" for text in texts]
+
+def make_batches(texts, max_count, max_chars):
+    """Packs texts, in order, into lists of at most max_count items and max_chars characters.
+
+    A single text longer than max_chars gets a batch of its own.
+    """
+    batches = []
+    batch = []
+    batch_chars = 0
+    for text in texts:
+        if batch and (len(batch) >= max_count or batch_chars + len(text) > max_chars):
+            batches.append(batch)
+            batch = []
+            batch_chars = 0
+        batch.append(text)
+        batch_chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+class BatchTranslator:
+    """Translates many short texts with few requests.
+
+    Identical texts are translated once, lines already in the optional translation
+    memory are reused, the rest are packed into batches under the backend's count/size
+    limits, batches run concurrently on max_workers threads, and results are mapped
+    back to the input order.
+    """
+
+    def __init__(self, backend, max_workers=4, max_batch_size=None, max_batch_chars=None, retries=3, backoff=1.0,
+                 memory=None):
+        self.backend = backend
+        self.memory = memory
+        self.max_workers = max_workers
+        self.max_batch_size = max_batch_size or backend.max_batch_size
+        self.max_batch_chars = max_batch_chars or backend.max_batch_chars
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = 0
+
+    def _translate_batch(self, batch, target_language, source_language):
+        translated = with_retries(lambda: self.backend.translate(batch, target_language, source_language),
+                                  self.retries, self.backoff, description=f"Translation batch of {len(batch)}")
+        if len(translated) != len(batch):
+            raise ValueError(f"Backend returned {len(translated)} translations for {len(batch)} texts")
+        return translated
+
+    def translate(self, texts, target_language='en', source_language=None):
+        """Returns the translations of texts, in the same order."""
+        unique_texts = [text for text in dict.fromkeys(texts) if text.strip()]
+        translations = {}
+        if self.memory is not None:
+            translations = self.memory.lookup_many(unique_texts, target_language, source_language, self.backend.engine)
+            unique_texts = [text for text in unique_texts if text not in translations]
+
+        batches = make_batches(unique_texts, self.max_batch_size, self.max_batch_chars)
+        self.requests += len(batches)
+
+        # 每个批次完成就写入翻译记忆，某个批次最终失败时已付费的结果也不会丢
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._translate_batch, batch, target_language, source_language): batch
+                       for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    batch_translations = dict(zip(futures[future], future.result()))
+                except Exception as e:
+                    error = error or e
+                    continue
+                if self.memory is not None:
+                    self.memory.store_many(batch_translations, target_language, source_language, self.backend.engine)
+                translations.update(batch_translations)
+        if error is not None:
+            raise error
+        return [translations.get(text, text) for text in texts]
@@ -0,0 +1,73 @@
+import re
+import sqlite3
+import threading
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Normalizes a source line for lookups: NFKC, trimmed, runs of whitespace collapsed."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+class TranslationMemory:
+    """Local SQLite store of earlier translations.
+
+    Entries are keyed by (normalized source text, source language, target language,
+    engine). Lookups and stores work on whole lists of lines, and hits/misses are
+    counted so a run can report how much it reused.
+    """
+
+    def __init__(self, db_path='translation_memory.sqlite'):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'source TEXT NOT NULL, source_language TEXT NOT NULL, target_language TEXT NOT NULL, '
+            'engine TEXT NOT NULL, translation TEXT NOT NULL, '
+            'PRIMARY KEY (source, source_language, target_language, engine))'
+        )
+        self._db.commit()
+
+    def lookup_many(self, texts, target_language, source_language=None, engine=''):
+        """Returns {text: translation} for the texts found in the memory."""
+        normalized = {}
+        for text in texts:
+            normalized.setdefault(normalize_text(text), []).append(text)
+        keys = list(normalized)
+
+        found = {}
+        with self._lock:
+            # SQLite 限制单条语句的参数个数，分批查询
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT source, translation FROM translations WHERE source_language = ? AND target_language = ? "
+                    f"AND engine = ? AND source IN ({','.join('?' * len(chunk))})",
+                    (source_language or 'auto', target_language, engine, *chunk),
+                ).fetchall()
+                for source, translation in rows:
+                    for text in normalized[source]:
+                        found[text] = translation
+            unique_texts = set(texts)
+            self.hits += len(found)
+            self.misses += len(unique_texts) - len(found)
+        return found
+
+    def store_many(self, translations, target_language, source_language=None, engine=''):
+        """Stores {text: translation} pairs in one transaction."""
+        rows = [(normalize_text(text), source_language or 'auto', target_language, engine, translation)
+                for text, translation in translations.items()]
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)', rows)
+            self._db.commit()
+
+    def hit_rate(self):
+        """Fraction of distinct lines looked up so far that were already translated."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_io import probe_audio
+from retry import with_retries
+
+class GTTSBackend:
+    """Google Translate TTS via gTTS. Writes MP3."""
+    engine = 'gtts'
+    extension = '.mp3'
+
+    def synthesize(self, text, lang, output_file):
+        from gtts import gTTS
+        gTTS(text=text, lang=lang).save(output_file)
+
+class SilentBackend:
+    """Offline stand-in for tests: writes a silent WAV whose length grows with the text."""
+    engine = 'silent'
+    extension = '.wav'
+
+    def __init__(self, seconds_per_char=0.06, min_seconds=0.3, sample_rate=16000):
+        self.seconds_per_char = seconds_per_char
+        self.min_seconds = min_seconds
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text, lang, output_file):
+        n_frames = int(max(self.min_seconds, len(text) * self.seconds_per_char) * self.sample_rate)
+        with wave.open(output_file, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(struct.pack('<h', 0) * n_frames)
+
+def tts_key(text, lang, engine):
+    """Content address of one synthesized line."""
+    return hashlib.sha256(f"{engine}\0{lang}\0{text}".encode('utf-8')).hexdigest()
+
+class RateLimiter:
+    """Thread-safe token bucket: at most rate calls per second on average, with bursts up to burst."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class TTSCache:
+    """Persistent, content-addressed store of synthesized lines and their durations.
+
+    Audio files live in cache_dir, named by hash(text, lang, engine); a SQLite index
+    records each file's size, measured duration and last use. When the total size
+    exceeds max_bytes (or the count exceeds max_entries), the least recently used
+    entries are evicted, except entries pinned by pin() (recorded in the same index,
+    so pins from other processes sharing cache_dir count too). Safe to share between
+    threads; if a rate_limiter is given, only actual backend calls (cache misses) wait on it.
+    """
+
+    def __init__(self, cache_dir='tts_cache', backend=None, max_bytes=2 * 1024 ** 3, max_entries=None, rate_limiter=None):
+        self.cache_dir = cache_dir
+        self.backend = backend or GTTSBackend()
+        self.rate_limiter = rate_limiter
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS clips ('
+            'key TEXT PRIMARY KEY, file TEXT NOT NULL, size INTEGER NOT NULL, '
+            'duration REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS clips_last_used ON clips (last_used)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS pins (key TEXT PRIMARY KEY, until REAL NOT NULL)')
+        self._db.commit()
+
+    def pin(self, texts, lang, seconds):
+        """Protects the lines from eviction for the next seconds, e.g. until the files returned for them are rendered."""
+        until = time.time() + seconds
+        with self._lock:
+            self._db.executemany('INSERT INTO pins VALUES (?, ?) '
+                                 'ON CONFLICT (key) DO UPDATE SET until = MAX(until, excluded.until)',
+                                 [(tts_key(text, lang, self.backend.engine), until) for text in set(texts)])
+            self._db.commit()
+
+    def lookup(self, text, lang):
+        """Returns (audio_file, duration) if the line is cached, otherwise None."""
+        key = tts_key(text, lang, self.backend.engine)
+        with self._lock:
+            row = self._db.execute('SELECT file, duration FROM clips WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            path = os.path.join(self.cache_dir, row[0])
+            if not os.path.exists(path):
+                # 文件被外部删除，索引失效
+                self._db.execute('DELETE FROM clips WHERE key = ?', (key,))
+                self._db.commit()
+                return None
+            self._db.execute('UPDATE clips SET last_used = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+            return path, row[1]
+
+    def synthesize(self, text, lang):
+        """Returns (audio_file, duration) for the line, synthesizing and measuring it only on a cache miss."""
+        cached = self.lookup(text, lang)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        key = tts_key(text, lang, self.backend.engine)
+        file_name = key + self.backend.extension
+        path = os.path.join(self.cache_dir, file_name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp{self.backend.extension}"
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        self.backend.synthesize(text, lang, tmp_path)
+        duration = probe_audio(tmp_path)['duration']
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.misses += 1
+            self._db.execute('INSERT OR REPLACE INTO clips VALUES (?, ?, ?, ?, ?)',
+                             (key, file_name, os.path.getsize(path), duration, time.time()))
+            self._db.commit()
+            self._evict(keep_key=key)
+        return path, duration
+
+    def _evict(self, keep_key=None):
+        total, count = self._db.execute('SELECT COALESCE(SUM(size), 0), COUNT(*) FROM clips').fetchone()
+        if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+            return
+        self._db.execute('DELETE FROM pins WHERE until <= ?', (time.time(),))
+        # 被钉住的条目（本批次或其他正在渲染的剧集还要用）不参与淘汰
+        candidates = self._db.execute('SELECT key, file, size FROM clips WHERE key NOT IN (SELECT key FROM pins) '
+                                      'ORDER BY last_used').fetchall()
+        for key, file_name, size in candidates:
+            if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                break
+            if key == keep_key:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+            except FileNotFoundError:
+                pass
+            self._db.execute('DELETE FROM clips WHERE key = ?', (key,))
+            total -= size
+            count -= 1
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+def synthesize_lines(cache, texts, lang='en', max_workers=8, retries=3, backoff=1.0, retry_on=(Exception,),
+                     pin_seconds=6 * 3600):
+    """Synthesizes texts concurrently through the cache and returns (audio_files, durations) in input order.
+
+    Repeated lines are synthesized once. Each line is retried with exponential backoff
+    on retry_on; durations are measured inside the workers, so they run in parallel too.
+    Every requested line is pinned for pin_seconds before synthesis starts, so evictions
+    caused by this batch or by other runs cannot delete files it returns before they
+    are rendered.
+    """
+    cache.pin(texts, lang, pin_seconds)
+
+    def run(text):
+        return with_retries(lambda: cache.synthesize(text, lang), retries, backoff, retry_on,
+                            description=f"TTS for {text[:30]!r}")
+
+    unique_texts = list(dict.fromkeys(texts))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip(unique_texts, executor.map(run, unique_texts)))
+    audio_files = [results[text][0] for text in texts]
+    durations = [results[text][1] for text in texts]
+    return audio_files, durations